@@ -0,0 +1,106 @@
+"""
+An in-process stand-in for the Hasura GraphQL API, implementing just enough of the mutations and queries
+used by ``run_logger`` to benchmark it without a database.
+"""
+import gzip
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Optional
+
+PARAMETER_CHOICES = [
+    dict(Key="lr", choice=[1e-3, 1e-4]),
+    dict(Key="depth", choice=[2, 4, 8]),
+]
+
+
+class FakeServer:
+    """
+    :param latency: Seconds to wait before answering each request, to simulate a remote server.
+    """
+
+    def __init__(self, latency: float = 0):
+        self.latency = latency
+        self.requests = 0
+        self.bytes_received = 0
+        self.rows = 0
+        self._next_id = 0
+        self._grid_index = 0
+        self._lock = threading.Lock()
+        self._server: Optional[ThreadingHTTPServer] = None
+
+    @property
+    def url(self) -> str:
+        host, port = self._server.server_address
+        return f"http://{host}:{port}/v1/graphql"
+
+    def __enter__(self):
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+            disable_nagle_algorithm = True
+
+            def log_message(self, *args):
+                pass
+
+            def do_POST(self):
+                body = self.rfile.read(int(self.headers["Content-Length"]))
+                size = len(body)
+                if self.headers.get("Content-Encoding") == "gzip":
+                    body = gzip.decompress(body)
+                request = json.loads(body)
+                if server.latency:
+                    time.sleep(server.latency)
+                data = server.respond(
+                    request["query"], request.get("variables") or {}, size
+                )
+                response = json.dumps(dict(data=data)).encode()
+                self.send_response(200)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(response)))
+                self.end_headers()
+                self.wfile.write(response)
+
+        self._server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        threading.Thread(target=self._server.serve_forever, daemon=True).start()
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self._server.shutdown()
+        self._server.server_close()
+
+    def reset(self):
+        with self._lock:
+            self.requests = self.bytes_received = self.rows = 0
+
+    def respond(self, query: str, variables: dict, size: int) -> dict:
+        with self._lock:
+            self.requests += 1
+            self.bytes_received += size
+            self.rows += len(variables.get("objects", ()))
+            self._next_id += 1
+            data = {}
+            if "insert_run_one" in query:
+                data["insert_run_one"] = dict(
+                    id=self._next_id, sweep=dict(parameter_choices=PARAMETER_CHOICES)
+                )
+            if "update_sweep" in query:
+                self._grid_index += 1
+                data["update_sweep"] = dict(
+                    returning=[dict(grid_index=self._grid_index)]
+                )
+            if "insert_run_log" in query:
+                data["insert_run_log"] = dict(affected_rows=len(variables["objects"]))
+            if "insert_run_blob" in query:
+                data["insert_run_blob"] = dict(affected_rows=len(variables["objects"]))
+            if "update_run" in query:
+                data["update_run"] = dict(affected_rows=1)
+            if "insert_sweep_one" in query:
+                data["insert_sweep_one"] = dict(
+                    id=self._next_id, metadata=variables.get("metadata")
+                )
+            if "run_by_pk" in query:
+                data["run_by_pk"] = dict(metadata=dict(lr=1e-3, depth=4))
+            return data
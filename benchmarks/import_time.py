@@ -0,0 +1,60 @@
+"""
+Measure how long ``import run_logger`` (and light submodules) take in a fresh interpreter,
+and which heavy dependencies they pull in. Exits with status 1 if the median import time
+of ``run_logger`` exceeds ``--max-ms``, so that it can guard against regressions.
+
+Usage: ``python benchmarks/import_time.py [--number N] [--max-ms MS]``
+"""
+import argparse
+import json
+import statistics
+import subprocess
+import sys
+
+MODULES = ["run_logger", "run_logger.params", "run_logger.main"]
+HEAVY = ["numpy", "gql", "graphql", "requests"]
+
+SCRIPT = """
+import json, sys, time
+start = time.perf_counter()
+import {module}
+seconds = time.perf_counter() - start
+print(json.dumps(dict(seconds=seconds, loaded=[m for m in {heavy!r} if m in sys.modules])))
+"""
+
+
+def measure(module: str) -> dict:
+    output = subprocess.run(
+        [sys.executable, "-c", SCRIPT.format(module=module, heavy=HEAVY)],
+        check=True,
+        capture_output=True,
+        text=True,
+    ).stdout
+    return json.loads(output)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--number", "-n", type=int, default=10)
+    parser.add_argument("--max-ms", type=float, default=50)
+    args = parser.parse_args()
+    results = []
+    for module in MODULES:
+        runs = [measure(module) for _ in range(args.number)]
+        results.append(
+            dict(
+                module=module,
+                median_ms=1e3 * statistics.median(r["seconds"] for r in runs),
+                min_ms=1e3 * min(r["seconds"] for r in runs),
+                loaded=runs[0]["loaded"],
+            )
+        )
+    print(json.dumps(results, indent=2))
+    if results[0]["median_ms"] > args.max_ms:
+        sys.exit(
+            f"import run_logger took {results[0]['median_ms']:.1f}ms (limit {args.max_ms}ms)"
+        )
+
+
+if __name__ == "__main__":
+    main()
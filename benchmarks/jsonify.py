@@ -0,0 +1,79 @@
+"""
+Compare :py:func:`run_logger.run.jsonify` against the original element-by-element
+implementation on typical log payloads.
+
+Usage: ``python benchmarks/jsonify.py [--number N]``
+"""
+import argparse
+import json
+import timeit
+from pathlib import Path
+
+import numpy as np
+
+from run_logger.run import jsonify
+
+
+def recursive_jsonify(value):
+    # the implementation jsonify replaced, kept here as a baseline
+    if isinstance(value, str):
+        return value
+    elif isinstance(value, Path):
+        return str(value)
+    elif np.isscalar(value):
+        if np.isnan(value):
+            return None
+        try:
+            return value.item()
+        except AttributeError:
+            return value
+    elif isinstance(value, np.ndarray):
+        return recursive_jsonify(value.tolist())
+    elif isinstance(value, dict):
+        return {recursive_jsonify(k): recursive_jsonify(v) for k, v in value.items()}
+    else:
+        try:
+            return [recursive_jsonify(v) for v in value]
+        except TypeError:
+            return value
+
+
+def payloads():
+    rng = np.random.default_rng(0)
+    histogram = rng.normal(size=10_000)
+    histogram[::100] = np.nan
+    scalars = {f"metric{i}": float(i) for i in range(20)}
+    scalars.update(step=100, name="run", done=False, loss=float("nan"))
+    yield "scalars", scalars
+    yield "numpy scalars", {f"metric{i}": np.float32(i) for i in range(20)}
+    yield "float array with nan", dict(histogram=histogram)
+    yield "int array", dict(counts=rng.integers(0, 100, size=10_000))
+    yield "bool array", dict(mask=rng.random(10_000) > 0.5)
+    yield "per-layer metrics", {
+        f"layer{i}": dict(norm=rng.random(256), grad=rng.random(256).astype(np.float32))
+        for i in range(24)
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--number", "-n", type=int, default=100)
+    args = parser.parse_args()
+    results = []
+    for name, payload in payloads():
+        assert json.dumps(jsonify(payload)) == json.dumps(recursive_jsonify(payload))
+        baseline = timeit.timeit(lambda: recursive_jsonify(payload), number=args.number)
+        current = timeit.timeit(lambda: jsonify(payload), number=args.number)
+        results.append(
+            dict(
+                payload=name,
+                baseline_us=1e6 * baseline / args.number,
+                jsonify_us=1e6 * current / args.number,
+                speedup=baseline / current,
+            )
+        )
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    main()
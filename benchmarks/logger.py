@@ -0,0 +1,196 @@
+"""
+Measure the throughput and per-call latency of ``RunLogger.log``, ``RunLogger.blob``, ``jsonify``,
+``initialize`` and ``param_generator`` against an in-process fake GraphQL server
+(see ``benchmarks/fake_server.py``), over varying payload sizes and ``debounce_time`` settings.
+Results are printed (or written to ``--output``) as a JSON list with one record per configuration.
+
+Usage: ``python benchmarks/logger.py [--number N] [--server-latency SECONDS] [--output PATH]``
+"""
+import argparse
+import json
+import statistics
+import sys
+import time
+from typing import Callable, Iterator, List
+
+import numpy as np
+from fake_server import FakeServer
+
+from run_logger import initialize
+from run_logger.cache import params_cache
+from run_logger.params import param_generator
+from run_logger.run import RunLogger, jsonify
+
+PAYLOAD_SIZES = [1, 10, 100]
+BLOB_SIZES = [1 << 10, 64 << 10, 1 << 20]
+DEBOUNCE_TIMES = [0, 0.01, 1]
+
+
+def record(name: str, latencies: List[float], total: float, **params) -> dict:
+    latencies = sorted(latencies)
+    return dict(
+        benchmark=name,
+        **params,
+        calls=len(latencies),
+        total_s=total,
+        calls_per_s=len(latencies) / total,
+        p50_us=1e6 * statistics.median(latencies),
+        p99_us=1e6 * latencies[int(0.99 * (len(latencies) - 1))],
+        max_us=1e6 * latencies[-1],
+    )
+
+
+def timed(calls: Iterator[Callable[[], object]]) -> List[float]:
+    latencies = []
+    for call in calls:
+        start = time.perf_counter()
+        call()
+        latencies.append(time.perf_counter() - start)
+    return latencies
+
+
+def bench_log(server: FakeServer, number: int) -> Iterator[dict]:
+    for size in PAYLOAD_SIZES:
+        row = {f"metric{i}": float(i) for i in range(size)}
+        for debounce_time in DEBOUNCE_TIMES:
+            logger = RunLogger(
+                server.url, debounce_time=debounce_time, flush_on_exit=False
+            )
+            logger.create_run(metadata={})
+            server.reset()
+            start = time.perf_counter()
+            latencies = timed(lambda: logger.log(step=i, **row) for i in range(number))
+            logger.close()
+            yield dict(
+                record(
+                    "log",
+                    latencies,
+                    time.perf_counter() - start,
+                    keys=size,
+                    debounce_time=debounce_time,
+                ),
+                requests=server.requests,
+                bytes_sent=server.bytes_received,
+            )
+
+
+def bench_blob(server: FakeServer, number: int) -> Iterator[dict]:
+    for size in BLOB_SIZES:
+        blob = "\\x" + bytes(size).hex()
+        for debounce_time in DEBOUNCE_TIMES:
+            logger = RunLogger(
+                server.url, debounce_time=debounce_time, flush_on_exit=False
+            )
+            logger.create_run(metadata={})
+            server.reset()
+            n = max(10, number * 1024 // size)
+            start = time.perf_counter()
+            latencies = timed(lambda: logger.blob(blob, {}) for _ in range(n))
+            logger.close()
+            yield dict(
+                record(
+                    "blob",
+                    latencies,
+                    time.perf_counter() - start,
+                    bytes=size,
+                    debounce_time=debounce_time,
+                ),
+                requests=server.requests,
+                bytes_sent=server.bytes_received,
+            )
+
+
+def bench_jsonify(number: int) -> Iterator[dict]:
+    rng = np.random.default_rng(0)
+    for size in PAYLOAD_SIZES:
+        payloads = dict(
+            floats={f"metric{i}": float(i) for i in range(size)},
+            numpy_scalars={f"metric{i}": np.float32(i) for i in range(size)},
+            array=dict(values=rng.normal(size=100 * size)),
+        )
+        for kind, payload in payloads.items():
+            start = time.perf_counter()
+            latencies = timed(lambda: jsonify(payload) for _ in range(number))
+            yield record(
+                "jsonify",
+                latencies,
+                time.perf_counter() - start,
+                payload=kind,
+                keys=size,
+            )
+
+
+def bench_initialize(server: FakeServer, number: int) -> Iterator[dict]:
+    cases = dict(
+        plain=dict(),
+        load=dict(load_id=1),
+        load_uncached=dict(load_id=1),
+        sweep=dict(sweep_id=1),
+    )
+    for case, kwargs in cases.items():
+        loggers = []
+
+        def call():
+            if case == "load_uncached":
+                params_cache.clear()
+            _, logger = initialize(server.url, name="bench", lr=0.1, **kwargs)
+            loggers.append(logger)
+
+        n = max(1, number // 10)
+        server.reset()
+        start = time.perf_counter()
+        latencies = timed(call for _ in range(n))
+        total = time.perf_counter() - start
+        yield dict(
+            record("initialize", latencies, total, case=case),
+            requests_per_call=server.requests / n,
+        )
+        for logger in loggers:
+            logger.flush_on_exit = False
+            logger.close()
+
+
+def bench_param_generator(number: int) -> Iterator[dict]:
+    for width in [2, 4, 8]:
+        params = {f"param{i}": list(range(width)) for i in range(4)}
+        start = time.perf_counter()
+        latencies = timed(lambda: list(param_generator(params)) for _ in range(number))
+        yield dict(
+            record(
+                "param_generator", latencies, time.perf_counter() - start, width=width
+            ),
+            combinations=width**4,
+        )
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--number", "-n", type=int, default=1000)
+    parser.add_argument(
+        "--server-latency",
+        type=float,
+        default=0,
+        help="Seconds the fake server waits before answering each request.",
+    )
+    parser.add_argument("--output", "-o", help="Write results to this file.")
+    args = parser.parse_args()
+    results = []
+    with FakeServer(latency=args.server_latency) as server:
+        results.extend(bench_log(server, args.number))
+        results.extend(bench_blob(server, args.number))
+        results.extend(bench_initialize(server, args.number))
+    results.extend(bench_jsonify(args.number))
+    results.extend(bench_param_generator(max(1, args.number // 100)))
+    output = json.dumps(
+        dict(python=sys.version.split()[0], number=args.number, results=results),
+        indent=2,
+    )
+    if args.output is None:
+        print(output)
+    else:
+        with open(args.output, "w") as f:
+            f.write(output)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,12 +1,42 @@
-from run_logger.main import (
-    NewParams,
-    create_run,
-    get_load_params,
-    initialize,
-    update_params,
-)
-from run_logger.run import Client, RunLogger
-from run_logger.sweep import SweepLogger, create_sweep
+import importlib
+from typing import TYPE_CHECKING
+
+# The public API is imported lazily (PEP 562), so that importing the package (or a light submodule
+# such as run_logger.params) does not pull in numpy, gql and the HTTP transports.
+_exports = {
+    "NewParams": "run_logger.main",
+    "create_run": "run_logger.main",
+    "get_load_params": "run_logger.main",
+    "initialize": "run_logger.main",
+    "LogPage": "run_logger.main",
+    "prefetch_load_params": "run_logger.main",
+    "read_logs": "run_logger.main",
+    "tail_logs": "run_logger.main",
+    "update_params": "run_logger.main",
+    "RunHandle": "run_logger.handle",
+    "Client": "run_logger.run",
+    "RunLogger": "run_logger.run",
+    "SweepLogger": "run_logger.sweep",
+    "create_sweep": "run_logger.sweep",
+    "top_k": "run_logger.sweep",
+}
+
+if TYPE_CHECKING:
+    from run_logger import main
+    from run_logger.handle import RunHandle
+    from run_logger.main import (
+        LogPage,
+        NewParams,
+        create_run,
+        get_load_params,
+        initialize,
+        prefetch_load_params,
+        read_logs,
+        tail_logs,
+        update_params,
+    )
+    from run_logger.run import Client, RunLogger
+    from run_logger.sweep import SweepLogger, create_sweep, top_k
 
 __all__ = [
     "Client",
@@ -14,9 +44,30 @@ __all__ = [
     "create_sweep",
     "get_load_params",
     "initialize",
+    "LogPage",
     "main",
     "NewParams",
+    "prefetch_load_params",
+    "read_logs",
+    "RunHandle",
     "RunLogger",
     "SweepLogger",
+    "tail_logs",
+    "top_k",
     "update_params",
 ]
+
+
+def __getattr__(name: str):
+    if name in _exports:
+        value = getattr(importlib.import_module(_exports[name]), name)
+    elif name == "main":
+        value = importlib.import_module("run_logger.main")
+    else:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    globals()[name] = value
+    return value
+
+
+def __dir__():
+    return sorted(set(globals()) | set(__all__))
@@ -0,0 +1,193 @@
+import numbers
+import random
+import time
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional, Union
+
+REDUCTIONS = ("mean", "min", "max", "last", "count")
+SAMPLINGS = ("reservoir", "decimate")
+
+
+@dataclass
+class AggregationPolicy:
+    """
+    Determines how :py:meth:`RunLogger.log <run_logger.run.RunLogger.log>` condenses logged rows before they are sent.
+    Rows are grouped into windows of ``window_steps`` steps (according to ``step_key``) or ``window_seconds`` seconds,
+    and each window is condensed into either
+
+    - a single row of per-key reductions (the default), or
+    - a sample of its rows (if ``sampling`` is set).
+
+    Only O(keys) values per window are kept in memory (O(``sample_size`` × keys) for reservoir sampling),
+    however many rows are logged. The last, partial window is emitted by
+    :py:meth:`RunLogger.close <run_logger.run.RunLogger.close>`.
+
+    :param window_steps: Number of steps per window. Requires ``step_key``.
+    :param window_seconds: Number of seconds per window (used if ``window_steps`` is ``None``).
+    :param step_key: The key holding the step number. Its reduction defaults to ``"last"``.
+    :param reductions: The reduction of each key: ``"mean"``, ``"min"``, ``"max"``, ``"last"`` or ``"count"``,
+        or a list of them, in which case the key is emitted once per reduction as ``f"{key}_{reduction}"``.
+    :param default: The reduction of numeric keys missing from ``reductions``. Non-numeric values
+        (e.g. strings) can only be reduced with ``"last"`` or ``"count"``, and use ``"last"`` otherwise.
+    :param sampling: ``"reservoir"`` to keep ``sample_size`` uniformly sampled rows per window,
+        or ``"decimate"`` to keep every ``sample_size``-th row.
+    :param sample_size: See ``sampling``.
+    :param seed: The seed for reservoir sampling.
+    """
+
+    window_steps: Optional[int] = None
+    window_seconds: float = 10
+    step_key: Optional[str] = "step"
+    reductions: Dict[str, Union[str, List[str]]] = field(default_factory=dict)
+    default: str = "mean"
+    sampling: Optional[str] = None
+    sample_size: int = 10
+    seed: int = 0
+
+    def __post_init__(self):
+        if self.window_steps is not None and self.step_key is None:
+            raise ValueError("window_steps requires a step_key")
+        if self.sampling is not None and self.sampling not in SAMPLINGS:
+            raise ValueError(f"Unknown sampling {self.sampling!r}")
+        for reductions in [self.default, *self.reductions.values()]:
+            for reduction in (
+                [reductions] if isinstance(reductions, str) else reductions
+            ):
+                if reduction not in REDUCTIONS:
+                    raise ValueError(f"Unknown reduction {reduction!r}")
+
+
+class Reduction:
+    """
+    Running statistics of the values of one key (e.g. within a window of an :py:class:`Aggregator`),
+    from which any of :py:data:`REDUCTIONS` can be computed.
+    """
+
+    __slots__ = ("count", "total", "min", "max", "last", "numeric")
+
+    def __init__(self):
+        self.count = 0
+        self.total = 0.0
+        self.min = self.max = self.last = None
+        self.numeric = True
+
+    def add(self, value):
+        self.count += 1
+        self.last = value
+        if self.numeric and isinstance(value, numbers.Real):
+            self.total += value
+            if self.min is None or value < self.min:
+                self.min = value
+            if self.max is None or value > self.max:
+                self.max = value
+        else:
+            self.numeric = False
+
+    def to_dict(self) -> dict:
+        """
+        :return: The statistics, in a JSON-compatible form accepted by :py:meth:`from_dict`.
+        """
+        return {slot: getattr(self, slot) for slot in self.__slots__}
+
+    @classmethod
+    def from_dict(cls, state: dict) -> "Reduction":
+        reduction = cls()
+        for slot in cls.__slots__:
+            setattr(reduction, slot, state[slot])
+        return reduction
+
+    def result(self, reduction: str):
+        if reduction == "count":
+            return self.count
+        if reduction == "last" or not self.numeric:
+            return self.last
+        if reduction == "mean":
+            return self.total / self.count
+        return getattr(self, reduction)
+
+
+class Aggregator:
+    """
+    Condenses rows according to an :py:class:`AggregationPolicy`.
+    """
+
+    def __init__(self, policy: AggregationPolicy):
+        self.policy = policy
+        self.random = random.Random(policy.seed)
+        self.window = None
+        self.seen = 0
+        self.reductions: Dict[str, Reduction] = {}
+        self.samples: List[dict] = []
+
+    def add(self, row: dict) -> List[dict]:
+        """
+        :return: The rows condensed from any window that ``row`` closes, or (when decimating) ``row`` itself if it is kept.
+        """
+        window = self._window(row)
+        emitted = []
+        if window != self.window:
+            emitted = self.drain()
+            self.window = window
+        self.seen += 1
+        sampling = self.policy.sampling
+        if sampling is None:
+            for key, value in row.items():
+                reduction = self.reductions.get(key)
+                if reduction is None:
+                    reduction = self.reductions[key] = Reduction()
+                reduction.add(value)
+        elif sampling == "decimate":
+            if (self.seen - 1) % self.policy.sample_size == 0:
+                emitted.append(row)
+        elif len(self.samples) < self.policy.sample_size:
+            self.samples.append(row)
+        else:
+            # reservoir sampling (algorithm R): keep each of the rows seen so far with equal probability
+            i = self.random.randrange(self.seen)
+            if i < self.policy.sample_size:
+                del self.samples[i]
+                self.samples.append(row)
+        return emitted
+
+    def drain(self) -> List[dict]:
+        """
+        Close the current window.
+
+        :return: The rows condensed from it.
+        """
+        if self.policy.sampling == "decimate":
+            rows = []
+        elif self.policy.sampling == "reservoir":
+            rows, self.samples = self.samples, []
+        elif self.reductions:
+            rows = [self._reduce()]
+        else:
+            rows = []
+        self.reductions = {}
+        self.seen = 0
+        self.window = None
+        return rows
+
+    def _window(self, row: dict):
+        if self.policy.window_steps is not None:
+            step = row.get(self.policy.step_key)
+            if step is None:
+                return self.window
+            return step // self.policy.window_steps
+        now = time.monotonic()
+        if self.window is None or now - self.window >= self.policy.window_seconds:
+            return now
+        return self.window
+
+    def _reduce(self) -> dict:
+        row = {}
+        for key, reduction in self.reductions.items():
+            names = self.policy.reductions.get(key)
+            if names is None:
+                names = "last" if key == self.policy.step_key else self.policy.default
+            if isinstance(names, str):
+                row[key] = reduction.result(names)
+            else:
+                for name in names:
+                    row[f"{key}_{name}"] = reduction.result(name)
+        return row
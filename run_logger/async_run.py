@@ -0,0 +1,248 @@
+import asyncio
+import logging
+import time
+from dataclasses import dataclass, field
+from typing import List, Optional, Set
+
+import aiohttp
+import numpy as np
+from gql import Client as GQLClient
+from gql.transport.aiohttp import AIOHTTPTransport
+from graphql import DocumentNode
+
+from run_logger.retry import RetryPolicy
+from run_logger.run import RunLogger, jsonify, sweep_configs, sweep_params
+from run_logger.sweep import SweepLogger
+
+# transient failures of the aiohttp transport, in addition to those recognized by RetryPolicy.is_retryable
+# (ClientConnectionError covers refused connections, dropped connections and read timeouts)
+_TRANSIENT_ERRORS = (
+    aiohttp.ClientConnectionError,
+    aiohttp.ClientPayloadError,
+    asyncio.TimeoutError,
+)
+
+
+@dataclass
+class AsyncClient:
+    """
+    The ``asyncio`` counterpart of :py:class:`Client <run_logger.run.Client>`, built on gql's aiohttp transport
+    (requires ``pip install "run-logger[aiohttp]"``). A single connection pool is shared by all concurrent requests.
+
+    :param graphql_endpoint: The endpoint of the Hasura GraphQL API.
+    :param timeout: Timeout (in seconds) for each HTTP request. If ``None``, requests never time out.
+    :param max_concurrency: Maximum number of requests in flight at once.
+    :param retry_policy: Determines which failures are retried, how often and how long to wait in between.
+        Connection errors and timeouts of aiohttp are retried in addition to those recognized by
+        :py:meth:`RetryPolicy.is_retryable <run_logger.retry.RetryPolicy.is_retryable>`.
+    """
+
+    graphql_endpoint: str
+    timeout: Optional[int] = None
+    max_concurrency: int = 10
+    retry_policy: RetryPolicy = field(default_factory=RetryPolicy)
+
+    def __post_init__(self):
+        transport = AIOHTTPTransport(url=self.graphql_endpoint, timeout=self.timeout)
+        self.client = GQLClient(transport=transport)
+        # asyncio primitives are created lazily so that they bind to the running event loop
+        self._semaphore = None
+        self._connecting = None
+        self._session = None
+
+    async def execute(self, query: DocumentNode, variable_values: dict):
+        variable_values = jsonify(variable_values)
+        await self._connect()
+        attempt = 0
+        async with self._semaphore:
+            while True:
+                attempt += 1
+                try:
+                    return await self._session.execute(
+                        query, variable_values=variable_values
+                    )
+                except Exception as e:
+                    if attempt >= self.retry_policy.max_attempts or not (
+                        self.is_retryable(e)
+                    ):
+                        raise
+                    sleep_time = self.retry_policy.backoff(attempt)
+                    logging.warning(
+                        f"{e!r} (attempt {attempt}/{self.retry_policy.max_attempts}), "
+                        f"retrying in {sleep_time:.1f}s"
+                    )
+                    await asyncio.sleep(sleep_time)
+
+    def is_retryable(self, exception: Exception) -> bool:
+        return isinstance(
+            exception, _TRANSIENT_ERRORS
+        ) or self.retry_policy.is_retryable(exception)
+
+    async def close(self):
+        if self._session is not None:
+            await self.client.__aexit__(None, None, None)
+            self._session = None
+
+    async def _connect(self):
+        if self._connecting is None:
+            self._connecting = asyncio.Lock()
+            self._semaphore = asyncio.Semaphore(self.max_concurrency)
+        async with self._connecting:
+            if self._session is None:
+                self._session = await self.client.__aenter__()
+
+
+@dataclass
+class AsyncRunLogger:
+    """
+    The ``asyncio`` counterpart of :py:class:`RunLogger <run_logger.run.RunLogger>`, with the same methods as coroutines.
+    :py:meth:`log` and :py:meth:`blob` do not wait for their mutations: they are sent by background tasks,
+    of which at most ``max_concurrency`` are in flight at once (beyond that, :py:meth:`log` and :py:meth:`blob` wait for a free slot).
+    Call :py:meth:`flush` to wait for them, or use ``async with``.
+
+    :param graphql_endpoint: The endpoint of the Hasura GraphQL API.
+    :param debounce_time: See :py:class:`RunLogger <run_logger.run.RunLogger>`.
+    :param max_concurrency: Maximum number of mutations in flight at once.
+    :param client: An :py:class:`AsyncClient` to use instead of the default one.
+    :param seed: See :py:class:`RunLogger <run_logger.run.RunLogger>`.
+    """
+
+    graphql_endpoint: str
+    debounce_time: float = 0
+    max_concurrency: int = 10
+    _run_id: Optional[int] = None
+    client: Optional[AsyncClient] = field(default=None, repr=False)
+    seed: int = 0
+
+    def __post_init__(self):
+        self.random = np.random.default_rng(seed=self.seed)
+        if self.client is None:
+            self.client = AsyncClient(
+                graphql_endpoint=self.graphql_endpoint,
+                max_concurrency=self.max_concurrency,
+            )
+        self._log_buffer = []
+        self._blob_buffer = []
+        self._last_log_time = None
+        self._last_blob_time = None
+        self._slots = None
+        self._tasks: Set[asyncio.Task] = set()
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, exc_type, exc_val, exc_tb):
+        await self.close()
+
+    @property
+    def run_id(self):
+        return self._run_id
+
+    async def create_run(
+        self,
+        metadata: Optional[dict],
+        charts: Optional[List[dict]] = None,
+        sweep_id: Optional[int] = None,
+    ) -> Optional[dict]:
+        """
+        See :py:meth:`RunLogger.create_run <run_logger.run.RunLogger.create_run>`.
+        """
+        mutation, variable_values = RunLogger.create_run_request(
+            metadata=metadata,
+            charts=charts,
+            sweep_id=sweep_id,
+            fetch_sweep=(self.graphql_endpoint, sweep_id) not in sweep_configs,
+        )
+        data = await self.client.execute(mutation, variable_values=variable_values)
+        self._run_id = data["insert_run_one"]["id"]
+        if sweep_id is not None:
+            return sweep_params(self.graphql_endpoint, self.random, sweep_id, data)
+
+    async def update_metadata(self, metadata: dict):
+        """
+        See :py:meth:`RunLogger.update_metadata <run_logger.run.RunLogger.update_metadata>`.
+        """
+        assert self.run_id is not None, "add_metadata called before create_run"
+        await self.client.execute(
+            RunLogger.update_metadata_mutation,
+            variable_values=dict(metadata=metadata, run_id=self.run_id),
+        )
+
+    async def log(self, **log):
+        """
+        See :py:meth:`RunLogger.log <run_logger.run.RunLogger.log>`.
+        """
+        assert self.run_id is not None, "log called before create_run"
+        self._log_buffer.append(dict(log=log, run_id=self.run_id))
+        if (
+            self._last_log_time is None
+            or time.time() - self._last_log_time > self.debounce_time
+        ):
+            await self._flush_logs()
+
+    async def blob(self, blob: str, metadata: dict):
+        """
+        See :py:meth:`RunLogger.blob <run_logger.run.RunLogger.blob>`.
+        """
+        assert self.run_id is not None, "blob called before create_run"
+        self._blob_buffer.append(dict(blob=blob, metadata=metadata, run_id=self.run_id))
+        if (
+            self._last_blob_time is None
+            or time.time() - self._last_blob_time > self.debounce_time
+        ):
+            await self._flush_blobs()
+
+    async def create_sweep(self, metadata: dict) -> int:
+        """
+        See :py:meth:`SweepLogger.create_sweep <run_logger.sweep.SweepLogger.create_sweep>`.
+        """
+        response = await self.client.execute(
+            SweepLogger.insert_new_sweep_mutation,
+            variable_values=dict(metadata=metadata),
+        )
+        return response["insert_sweep_one"]["id"]
+
+    async def flush(self):
+        """
+        Send all buffered logs and blobs and wait for every mutation in flight.
+        Failed mutations are logged, not raised.
+        """
+        await self._flush_logs()
+        await self._flush_blobs()
+        while self._tasks:
+            await asyncio.wait(set(self._tasks))
+
+    async def close(self):
+        """
+        :py:meth:`flush` and close the client's connections.
+        """
+        await self.flush()
+        await self.client.close()
+
+    async def _flush_logs(self):
+        self._last_log_time = time.time()
+        if self._log_buffer:
+            objects, self._log_buffer = self._log_buffer, []
+            await self._spawn(RunLogger.insert_run_logs_mutation, objects)
+
+    async def _flush_blobs(self):
+        self._last_blob_time = time.time()
+        if self._blob_buffer:
+            objects, self._blob_buffer = self._blob_buffer, []
+            await self._spawn(RunLogger.insert_run_blobs_mutation, objects)
+
+    async def _spawn(self, mutation: DocumentNode, objects: List[dict]):
+        if self._slots is None:
+            self._slots = asyncio.Semaphore(self.max_concurrency)
+        await self._slots.acquire()
+        task = asyncio.create_task(self._insert(mutation, objects))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    async def _insert(self, mutation: DocumentNode, objects: List[dict]):
+        try:
+            await self.client.execute(mutation, variable_values=dict(objects=objects))
+        except Exception:
+            logging.exception(f"Failed to insert {len(objects)} rows")
+        finally:
+            self._slots.release()
@@ -0,0 +1,147 @@
+import logging
+import queue
+import threading
+import time
+from typing import Callable, Dict, List, Optional
+
+from run_logger.batching import Buffer, FlushPolicy
+
+_STOP = object()
+
+# seconds between checks that the worker thread is still alive, while waiting on it
+_POLL_INTERVAL = 0.1
+
+
+class BackgroundFlusher:
+    """
+    Sends rows enqueued by :py:class:`RunLogger <run_logger.run.RunLogger>` from a
+    daemon thread, so that network round-trips stay off the caller's hot path.
+
+    Rows are grouped by ``kind`` (e.g. ``"log"`` or ``"blob"``), each with its own
+    :py:class:`FlushPolicy <run_logger.batching.FlushPolicy>`. Rows of a kind are sent as soon as
+    they reach the policy's ``max_rows`` or ``max_bytes`` or the oldest of them has waited
+    ``max_latency`` seconds, whichever comes first.
+
+    :param send: Called on the worker thread with a ``kind`` and a list of rows.
+    :param policies: The flush policy for each kind of row.
+    :param max_queue_size: Maximum number of rows waiting in the queue. When the queue is full,
+        :py:meth:`put` blocks until the worker catches up.
+    """
+
+    def __init__(
+        self,
+        send: Callable[[str, List[dict]], None],
+        policies: Dict[str, FlushPolicy],
+        max_queue_size: int,
+    ):
+        self.send = send
+        self.policies = policies
+        self.queue = queue.Queue(maxsize=max_queue_size)
+        # the exception that stopped the worker thread, if any
+        self.error: Optional[BaseException] = None
+        self.closed = False
+        self.thread = threading.Thread(
+            target=self._run, name="run-logger-flush", daemon=True
+        )
+        self.thread.start()
+
+    def put(self, kind: str, row: dict):
+        """
+        Enqueue a row. Blocks while the queue is full.
+
+        :raises: The exception that stopped the worker thread, if it failed.
+        """
+        if self.closed:
+            raise RuntimeError("put called after close")
+        self._put((kind, row))
+
+    def flush(self):
+        """
+        Block until every row enqueued before this call has been sent.
+
+        :raises: The exception that stopped the worker thread, if it failed.
+        """
+        if self.closed:
+            return
+        done = threading.Event()
+        self._put(done)
+        while not done.wait(_POLL_INTERVAL):
+            self._check_alive()
+
+    def close(self):
+        """
+        Send all pending rows and stop the worker thread.
+        """
+        if self.closed:
+            return
+        self.closed = True
+        if not self.thread.is_alive():
+            return
+        self.queue.put(_STOP)
+        self.thread.join()
+
+    def _put(self, item):
+        # unlike queue.put, does not block forever on a full queue if the worker has died
+        while True:
+            self._check_alive()
+            try:
+                self.queue.put(item, timeout=_POLL_INTERVAL)
+                return
+            except queue.Full:
+                pass
+
+    def _check_alive(self):
+        if not self.thread.is_alive():
+            if self.error is not None:
+                raise self.error
+            raise RuntimeError("background flush thread is not running")
+
+    def _run(self):
+        try:
+            self._loop()
+        except BaseException as e:
+            self.error = e
+            raise
+
+    def _loop(self):
+        buffers = {kind: Buffer(policy) for kind, policy in self.policies.items()}
+        deadlines: Dict[str, float] = {}
+        while True:
+            timeout = None
+            if deadlines:
+                timeout = max(0.0, min(deadlines.values()) - time.monotonic())
+            try:
+                item = self.queue.get(timeout=timeout)
+            except queue.Empty:
+                item = None
+
+            if item is None:
+                now = time.monotonic()
+                for kind, deadline in list(deadlines.items()):
+                    if deadline <= now:
+                        self._send(kind, buffers[kind], deadlines)
+            elif item is _STOP or isinstance(item, threading.Event):
+                for kind, buffer in buffers.items():
+                    self._send(kind, buffer, deadlines)
+                if item is _STOP:
+                    return
+                item.set()
+            else:
+                kind, row = item
+                buffer = buffers[kind]
+                try:
+                    full = buffer.append(row)
+                except Exception:
+                    logging.exception(f"Dropping {kind} row that cannot be serialized")
+                    continue
+                deadlines.setdefault(kind, time.monotonic() + buffer.policy.max_latency)
+                if full:
+                    self._send(kind, buffer, deadlines)
+
+    def _send(self, kind: str, buffer: Buffer, deadlines: Dict[str, float]):
+        deadlines.pop(kind, None)
+        for rows in buffer.drain():
+            try:
+                self.send(kind, rows)
+            except Exception:
+                logging.exception(f"Failed to send {len(rows)} {kind} rows")
@@ -0,0 +1,109 @@
+import json
+import time
+from dataclasses import dataclass
+from typing import Iterator, List, Optional, Sequence
+
+
+@dataclass
+class FlushPolicy:
+    """
+    Determines when buffered rows are sent and how they are split into API calls.
+
+    :param max_rows: Maximum number of rows per API call. Rows are sent as soon as this many are buffered.
+    :param max_bytes: Maximum serialized size (in bytes) of the rows in an API call. Rows are sent as soon as
+        this many bytes are buffered. A single row larger than ``max_bytes`` is sent on its own.
+        If ``None``, sizes are not tracked (which saves serializing every row).
+    :param max_latency: Maximum number of seconds a row is held back before being sent.
+    """
+
+    max_rows: int = 1000
+    max_bytes: Optional[int] = None
+    max_latency: float = 0
+
+
+def serialized_size(row: dict) -> int:
+    from run_logger.run import jsonify
+
+    return len(json.dumps(jsonify(row)))
+
+
+def split(
+    rows: Sequence[dict], policy: FlushPolicy, sizes: Optional[Sequence[int]] = None
+) -> Iterator[List[dict]]:
+    """
+    Split ``rows`` into consecutive batches that respect ``policy.max_rows`` and ``policy.max_bytes``.
+
+    :param sizes: The serialized size of each row, if already known.
+    """
+    if policy.max_bytes is None:
+        for start in range(0, len(rows), policy.max_rows):
+            yield list(rows[start : start + policy.max_rows])
+        return
+    if sizes is None:
+        sizes = [serialized_size(row) for row in rows]
+    batch: List[dict] = []
+    nbytes = 0
+    for row, size in zip(rows, sizes):
+        if batch and (
+            len(batch) >= policy.max_rows or nbytes + size > policy.max_bytes
+        ):
+            yield batch
+            batch, nbytes = [], 0
+        batch.append(row)
+        nbytes += size
+    if batch:
+        yield batch
+
+
+class Buffer:
+    """
+    Rows waiting to be sent, along with the :py:class:`FlushPolicy` that decides when and how to send them.
+    """
+
+    def __init__(self, policy: FlushPolicy):
+        self.policy = policy
+        self.rows: List[dict] = []
+        self.sizes: List[int] = []
+        self.nbytes = 0
+        self.last_flush_time: Optional[float] = None
+
+    def __len__(self):
+        return len(self.rows)
+
+    def append(self, row: dict) -> bool:
+        """
+        :return: Whether the buffer has reached ``max_rows`` or ``max_bytes`` and should be sent.
+        :raises TypeError: If ``max_bytes`` is set and ``row`` is not JSON-serializable. The row is not added.
+        """
+        if self.policy.max_bytes is not None:
+            # measured before the row is added, so that a row that cannot be serialized is not kept
+            size = serialized_size(row)
+            self.rows.append(row)
+            self.sizes.append(size)
+            self.nbytes += size
+            if self.nbytes >= self.policy.max_bytes:
+                return True
+        else:
+            self.rows.append(row)
+        return len(self.rows) >= self.policy.max_rows
+
+    def stale(self) -> bool:
+        """
+        :return: Whether more than ``max_latency`` seconds have passed since the buffer was last drained
+            (or it has never been drained).
+        """
+        return (
+            self.last_flush_time is None
+            or time.time() - self.last_flush_time > self.policy.max_latency
+        )
+
+    def drain(self) -> List[List[dict]]:
+        """
+        Empty the buffer.
+
+        :return: The buffered rows, split into batches according to the policy.
+        """
+        batches = list(split(self.rows, self.policy, self.sizes or None))
+        self.rows, self.sizes, self.nbytes = [], [], 0
+        self.last_flush_time = time.time()
+        return batches
@@ -0,0 +1,164 @@
+import hashlib
+import uuid
+import zlib
+from pathlib import Path
+from typing import Iterable, Iterator, Optional, Union
+
+from run_logger.documents import LazyDocument
+
+BlobSource = Union[bytes, bytearray, memoryview, str, Path, Iterable[bytes]]
+
+READ_SIZE = 1 << 20
+
+read_manifest_query = LazyDocument(
+    """
+query read_blob_manifest($blob_id: jsonb!) {
+  run_blob(where: {metadata: {_contains: $blob_id, _has_key: "blob_manifest"}}, limit: 1) {
+    metadata
+  }
+}
+"""
+)
+read_chunk_query = LazyDocument(
+    """
+query read_blob_chunk($chunk: jsonb!) {
+  run_blob(where: {metadata: {_contains: $chunk}}, limit: 1) {
+    blob
+  }
+}
+"""
+)
+
+
+def read_source(source: BlobSource, read_size: int = READ_SIZE) -> Iterator[bytes]:
+    """
+    Yield the contents of ``source`` in pieces of at most ``read_size`` bytes (pieces of iterators are passed through).
+
+    :param source: ``bytes``, a ``bytearray`` or ``memoryview`` (sliced without copying), a file path,
+        a binary file object or an iterable of ``bytes``.
+    """
+    if isinstance(source, (bytes, bytearray, memoryview)):
+        view = memoryview(source).cast("B")
+        for start in range(0, len(view), read_size):
+            yield view[start : start + read_size]
+    elif isinstance(source, (str, Path)):
+        with open(source, "rb") as f:
+            yield from iter(lambda: f.read(read_size), b"")
+    elif hasattr(source, "read"):
+        yield from iter(lambda: source.read(read_size), b"")
+    else:
+        yield from source
+
+
+def compressor(compression: Optional[str]):
+    if compression is None:
+        return None
+    if compression == "gzip":
+        return zlib.compressobj(wbits=31)
+    if compression == "zstd":
+        import zstandard
+
+        return zstandard.ZstdCompressor().compressobj()
+    raise ValueError(f"Unknown compression {compression!r}")
+
+
+def decompressor(compression: Optional[str]):
+    if compression is None:
+        return None
+    if compression == "gzip":
+        return zlib.decompressobj(wbits=31)
+    if compression == "zstd":
+        import zstandard
+
+        return zstandard.ZstdDecompressor().decompressobj()
+    raise ValueError(f"Unknown compression {compression!r}")
+
+
+def blob_rows(
+    source: BlobSource,
+    metadata: dict,
+    run_id: int,
+    chunk_size: int,
+    compression: Optional[str],
+) -> Iterator[dict]:
+    """
+    Yield ``run_blob`` rows holding ``source``, compressed and split into chunks of ``chunk_size`` bytes,
+    followed by a manifest row. Only one chunk is held in memory at a time.
+
+    Chunk rows have metadata ``{"blob_id": ..., "blob_chunk": i}``. The manifest row has an empty ``blob``
+    and metadata ``{**metadata, "blob_id": ..., "blob_manifest": {...}}``, where the manifest records the number of chunks,
+    the compression, and the size and SHA-256 digest of the uncompressed data.
+    """
+    blob_id = uuid.uuid4().hex
+    compress = compressor(compression)
+    digest = hashlib.sha256()
+    size = 0
+    chunks = 0
+    buffer = bytearray()
+
+    def row(chunk) -> dict:
+        return dict(
+            blob="\\x" + chunk.hex(),
+            metadata=dict(blob_id=blob_id, blob_chunk=chunks),
+            run_id=run_id,
+        )
+
+    for piece in read_source(source):
+        digest.update(piece)
+        size += len(piece)
+        buffer += piece if compress is None else compress.compress(piece)
+        while len(buffer) >= chunk_size:
+            yield row(buffer[:chunk_size])
+            del buffer[:chunk_size]
+            chunks += 1
+    if compress is not None:
+        buffer += compress.flush()
+    if buffer or not chunks:
+        yield row(buffer)
+        chunks += 1
+    manifest = dict(
+        chunks=chunks,
+        compression=compression,
+        size=size,
+        sha256=digest.hexdigest(),
+    )
+    yield dict(
+        blob="\\x",
+        metadata=dict(metadata, blob_id=blob_id, blob_manifest=manifest),
+        run_id=run_id,
+    )
+
+
+def read_blob(blob_id: str, logger) -> Iterator[bytes]:
+    """
+    Stream the (decompressed) contents of a blob stored with
+    :py:meth:`RunLogger.stream_blob <run_logger.run.RunLogger.stream_blob>`, fetching one chunk at a time.
+    Raises ``ValueError`` if the data does not match the manifest's size and digest.
+
+    :param blob_id: The ID returned by :py:meth:`RunLogger.stream_blob <run_logger.run.RunLogger.stream_blob>`.
+    :param logger: A :py:class:`RunLogger <run_logger.run.RunLogger>` connected to the database where the blob is stored.
+    """
+    responses = logger.execute(
+        read_manifest_query.document,
+        variable_values=dict(blob_id=dict(blob_id=blob_id)),
+    )["run_blob"]
+    if not responses:
+        raise ValueError(f"No manifest found for blob {blob_id}")
+    [response] = responses
+    manifest = response["metadata"]["blob_manifest"]
+    decompress = decompressor(manifest["compression"])
+    digest = hashlib.sha256()
+    size = 0
+    for i in range(manifest["chunks"]):
+        [chunk] = logger.execute(
+            read_chunk_query.document,
+            variable_values=dict(chunk=dict(blob_id=blob_id, blob_chunk=i)),
+        )["run_blob"]
+        data = bytes.fromhex(chunk["blob"][2:])
+        if decompress is not None:
+            data = decompress.decompress(data)
+        digest.update(data)
+        size += len(data)
+        yield data
+    if size != manifest["size"] or digest.hexdigest() != manifest["sha256"]:
+        raise ValueError(f"Blob {blob_id} does not match its manifest")
@@ -0,0 +1,124 @@
+import contextlib
+import hashlib
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+from pathlib import Path
+from typing import Any, Callable, Optional, Tuple, Union
+
+try:
+    import fcntl
+except ImportError:  # not available on Windows
+    fcntl = None
+
+MISSING = object()
+
+
+class ParamsCache:
+    """
+    A cache of run parameters keyed by ``(graphql_endpoint, run_id)``, with an in-process LRU layer
+    and an optional on-disk layer shared by every process on the machine. On a disk miss, concurrent processes
+    wait for whichever of them acquired the key's lock first to fetch the value, instead of all querying the database.
+
+    :param maxsize: Maximum number of entries kept in memory.
+    :param ttl: Number of seconds after which an entry expires. If ``None``, entries never expire.
+    :param directory: Directory for the on-disk layer. If ``None``, only the in-process layer is used.
+    """
+
+    def __init__(
+        self,
+        maxsize: int = 1024,
+        ttl: Optional[float] = 600,
+        directory: Optional[Union[Path, str]] = None,
+    ):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.directory = None if directory is None else Path(directory)
+        self._entries: "OrderedDict[Tuple[str, int], Tuple[float, Any]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, endpoint: str, run_id: int) -> Any:
+        """
+        :return: The cached value, or :py:data:`MISSING`.
+        """
+        key = (endpoint, run_id)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                stored, value = entry
+                if not self._expired(stored):
+                    self._entries.move_to_end(key)
+                    return value
+                del self._entries[key]
+        if self.directory is None:
+            return MISSING
+        try:
+            with self._path(endpoint, run_id).open() as f:
+                entry = json.load(f)
+        except (OSError, ValueError):
+            return MISSING
+        if self._expired(entry["time"]):
+            return MISSING
+        self._remember(key, entry["time"], entry["value"])
+        return entry["value"]
+
+    def put(self, endpoint: str, run_id: int, value: Any):
+        stored = time.time()
+        self._remember((endpoint, run_id), stored, value)
+        if self.directory is not None:
+            self.directory.mkdir(parents=True, exist_ok=True)
+            path = self._path(endpoint, run_id)
+            tmp = path.with_suffix(f".{os.getpid()}.tmp")
+            tmp.write_text(json.dumps(dict(time=stored, value=value)))
+            os.replace(tmp, path)
+
+    def get_or_fetch(self, endpoint: str, run_id: int, fetch: Callable[[], Any]) -> Any:
+        """
+        :return: The cached value, or the result of ``fetch()``, which is then cached.
+        """
+        value = self.get(endpoint, run_id)
+        if value is not MISSING:
+            return value
+        with self._file_lock(endpoint, run_id):
+            # another process may have fetched the value while we waited for the lock
+            value = self.get(endpoint, run_id)
+            if value is MISSING:
+                value = fetch()
+                self.put(endpoint, run_id, value)
+        return value
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def _expired(self, stored: float) -> bool:
+        return self.ttl is not None and time.time() - stored > self.ttl
+
+    def _remember(self, key: Tuple[str, int], stored: float, value: Any):
+        with self._lock:
+            self._entries[key] = stored, value
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+
+    def _path(self, endpoint: str, run_id: int) -> Path:
+        digest = hashlib.sha1(endpoint.encode()).hexdigest()[:16]
+        return self.directory / f"{digest}-{run_id}.json"
+
+    @contextlib.contextmanager
+    def _file_lock(self, endpoint: str, run_id: int):
+        if self.directory is None or fcntl is None:
+            yield
+            return
+        self.directory.mkdir(parents=True, exist_ok=True)
+        with self._path(endpoint, run_id).with_suffix(".lock").open("w") as f:
+            fcntl.flock(f, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(f, fcntl.LOCK_UN)
+
+
+params_cache = ParamsCache(directory=os.getenv("RUN_LOGGER_CACHE_DIR"))
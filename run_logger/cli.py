@@ -0,0 +1,96 @@
+import argparse
+import copy
+import logging
+import os
+from pathlib import Path
+
+from run_logger.relay import serve
+from run_logger.retry import replay_spilled
+from run_logger.sweep import log_levels
+from run_logger.wal import upload_all
+
+
+def main():
+    parser = argparse.ArgumentParser(prog="run-logger")
+    parser.add_argument("--log-level", "-ll", choices=log_levels, default="INFO")
+    subparsers = parser.add_subparsers(required=True)
+
+    upload_parser = subparsers.add_parser(
+        "upload", help="Upload runs logged offline (with LocalClient) to Hasura."
+    )
+    upload_parser.add_argument(
+        "paths",
+        nargs="+",
+        type=Path,
+        help="Run files or directories containing run files.",
+    )
+    upload_parser.add_argument(
+        "--graphql-endpoint",
+        "-g",
+        default=os.getenv("GRAPHQL_ENDPOINT"),
+        help="Endpoint to use for hasura.",
+    )
+    upload_parser.add_argument(
+        "--batch-size",
+        "-b",
+        type=int,
+        default=1000,
+        help="Maximum number of rows per mutation.",
+    )
+    upload_parser.set_defaults(func=upload_all)
+
+    replay_parser = subparsers.add_parser(
+        "replay",
+        help="Replay mutations spilled by processes that exited before sending them.",
+    )
+    replay_parser.add_argument(
+        "--graphql-endpoint",
+        "-g",
+        default=os.getenv("GRAPHQL_ENDPOINT"),
+        help="Endpoint to use for hasura.",
+    )
+    replay_parser.add_argument(
+        "--spill-dir",
+        type=Path,
+        default=None,
+        help="Directory of the spill queues (defaults to $RUN_LOGGER_SPILL_DIR or ~/.cache/run-logger/spill).",
+    )
+    replay_parser.set_defaults(func=replay_spilled)
+
+    relay_parser = subparsers.add_parser(
+        "relay",
+        help="Run a node-local relay that batches logs from many processes (see RelayClient).",
+    )
+    relay_parser.add_argument(
+        "address", help="Unix socket path or host:port to listen on."
+    )
+    relay_parser.add_argument(
+        "--graphql-endpoint",
+        "-g",
+        default=os.getenv("GRAPHQL_ENDPOINT"),
+        help="Endpoint to use for hasura.",
+    )
+    relay_parser.add_argument(
+        "--max-rows",
+        type=int,
+        default=1000,
+        help="Maximum number of rows per forwarded mutation.",
+    )
+    relay_parser.add_argument(
+        "--max-latency",
+        type=float,
+        default=0.5,
+        help="Maximum number of seconds a row is held back before being forwarded.",
+    )
+    relay_parser.set_defaults(func=serve)
+
+    args = parser.parse_args()
+    logging.getLogger().setLevel(args.log_level)
+    _args = vars(copy.deepcopy(args))
+    del _args["func"]
+    del _args["log_level"]
+    args.func(**_args)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,45 @@
+import threading
+from typing import TYPE_CHECKING, Optional
+
+if TYPE_CHECKING:
+    from graphql import DocumentNode
+
+
+class LazyDocument:
+    """
+    A GraphQL document that is only parsed (with ``gql``) the first time it is used, then cached.
+    As a class attribute, it evaluates to the parsed ``DocumentNode``, both on the class and on its instances::
+
+        class RunLogger:
+            update_metadata_mutation = LazyDocument("mutation update_metadata(...) { ... }")
+
+        RunLogger.update_metadata_mutation  # a DocumentNode
+
+    Elsewhere, use :py:attr:`document`.
+
+    :param source: The text of the document.
+    """
+
+    _lock = threading.Lock()
+
+    def __init__(self, source: str):
+        self.source = source
+        self._document: Optional["DocumentNode"] = None
+
+    @property
+    def document(self) -> "DocumentNode":
+        if self._document is None:
+            with self._lock:
+                if self._document is None:
+                    from gql import gql
+
+                    self._document = gql(self.source)
+        return self._document
+
+    def __get__(self, instance, owner) -> "DocumentNode":
+        return self.document
+
+
+def operation_name(query: "DocumentNode") -> Optional[str]:
+    [definition, *_] = query.definitions
+    return None if definition.name is None else definition.name.value
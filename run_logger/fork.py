@@ -0,0 +1,43 @@
+import inspect
+import itertools
+import os
+import threading
+import weakref
+from typing import Callable, Dict, Optional
+
+# the hooks to call in the child, in the order in which they were registered
+_hooks: Dict[int, Callable[[], Optional[Callable[[], None]]]] = {}
+_keys = itertools.count()
+_lock = threading.Lock()
+
+
+def on_child(fn: Callable[[], None]) -> None:
+    """
+    Ensure that ``fn()`` is called in the child process after every ``fork``, so that
+    the child does not share connections, locks or buffered rows with its parent.
+
+    :param fn: A function, or a bound method (e.g. of a :py:class:`RunLogger <run_logger.run.RunLogger>`),
+        which is only referenced weakly, so that registering it does not keep its object alive.
+    """
+    with _lock:
+        key = next(_keys)
+        if inspect.ismethod(fn):
+            _hooks[key] = weakref.WeakMethod(
+                fn, lambda _, key=key: _hooks.pop(key, None)
+            )
+        else:
+            _hooks[key] = lambda: fn
+
+
+def _after_fork_in_child():
+    global _lock
+    # the parent may have forked while another thread held the lock
+    _lock = threading.Lock()
+    for hook in list(_hooks.values()):
+        fn = hook()
+        if fn is not None:
+            fn()
+
+
+if hasattr(os, "register_at_fork"):  # not available on Windows
+    os.register_at_fork(after_in_child=_after_fork_in_child)
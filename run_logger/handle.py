@@ -0,0 +1,109 @@
+import threading
+from dataclasses import dataclass
+from typing import Dict, Iterable, Optional
+
+from run_logger import fork
+from run_logger.relay import RelayClient
+from run_logger.run import RunLogger
+
+# the logger of each handle in this process
+_loggers: Dict["RunHandle", RunLogger] = {}
+_lock = threading.Lock()
+
+
+@dataclass(frozen=True)
+class RunHandle:
+    """
+    A lightweight, picklable reference to an existing run, for logging to it from other processes,
+    e.g. ``ProcessPoolExecutor`` or ``multiprocessing.Pool`` workers::
+
+        handle = logger.handle()
+        with ProcessPoolExecutor() as pool:
+            pool.map(evaluate, [handle] * n)
+
+        def evaluate(handle):
+            ...
+            handle.log(reward=reward)
+            handle.flush()
+
+    Each process lazily creates its own :py:class:`RunLogger <run_logger.run.RunLogger>` (and connections) for the run
+    on first use; after a ``fork``, the child creates a new one instead of sharing its parent's.
+    Pool workers may exit without running ``atexit`` handlers, so call :py:meth:`flush` at the end of each task
+    (or keep the default ``debounce_time=0``, which sends every row immediately).
+
+    :param graphql_endpoint: The endpoint of the Hasura GraphQL API.
+    :param run_id: The ID of the run.
+    :param relay: The address of a :py:class:`Relay <run_logger.relay.Relay>` to log through instead of ``graphql_endpoint``.
+    """
+
+    graphql_endpoint: Optional[str]
+    run_id: int
+    relay: Optional[str] = None
+
+    @classmethod
+    def of(cls, logger: RunLogger) -> "RunHandle":
+        assert logger.run_id is not None, "handle called before create_run"
+        if isinstance(logger.client, RelayClient):
+            return cls(
+                logger.graphql_endpoint, logger.run_id, relay=logger.client.address
+            )
+        if logger.graphql_endpoint is None:
+            raise ValueError(
+                "RunHandle requires a logger with a graphql_endpoint or a relay"
+            )
+        return cls(logger.graphql_endpoint, logger.run_id)
+
+    def logger(self, **kwargs) -> RunLogger:
+        """
+        :param kwargs: Passed to :py:class:`RunLogger <run_logger.run.RunLogger>` when this process's logger is created
+            (e.g. ``debounce_time``); ignored afterwards.
+        :return: This process's logger for the run.
+        """
+        with _lock:
+            logger = _loggers.get(self)
+            if logger is None:
+                client = None if self.relay is None else RelayClient(self.relay)
+                logger = _loggers[self] = RunLogger(
+                    self.graphql_endpoint, _run_id=self.run_id, client=client, **kwargs
+                )
+            return logger
+
+    def log(self, **log):
+        """
+        See :py:meth:`RunLogger.log <run_logger.run.RunLogger.log>`.
+        """
+        self.logger().log(**log)
+
+    def log_many(self, logs: Iterable[dict]):
+        """
+        See :py:meth:`RunLogger.log_many <run_logger.run.RunLogger.log_many>`.
+        """
+        self.logger().log_many(logs)
+
+    def blob(self, blob: str, metadata: dict):
+        """
+        See :py:meth:`RunLogger.blob <run_logger.run.RunLogger.blob>`.
+        """
+        self.logger().blob(blob, metadata)
+
+    def update_metadata(self, metadata: dict):
+        """
+        See :py:meth:`RunLogger.update_metadata <run_logger.run.RunLogger.update_metadata>`.
+        """
+        self.logger().update_metadata(metadata)
+
+    def flush(self):
+        """
+        See :py:meth:`RunLogger.flush <run_logger.run.RunLogger.flush>`.
+        """
+        self.logger().flush()
+
+
+def _after_fork_in_child():
+    global _lock
+    _lock = threading.Lock()
+    # loggers inherited from the parent are not reused: each process creates its own
+    _loggers.clear()
+
+
+fork.on_child(_after_fork_in_child)
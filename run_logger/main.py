@@ -1,10 +1,18 @@
+import json
+import time
 from dataclasses import astuple, dataclass
+from functools import lru_cache
 from pathlib import Path
-from typing import Dict, List, Optional, Tuple, Union
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Sequence, Tuple, Union
 
-from gql import gql
+import numpy as np
+from graphql import DocumentNode
 
+from run_logger.cache import MISSING, ParamsCache, params_cache
+from run_logger.documents import LazyDocument
+from run_logger.relay import RelayClient
 from run_logger.run import RunLogger
+from run_logger.wal import LocalClient
 
 
 @dataclass
@@ -14,24 +22,252 @@ class NewParams:
     load_params: Optional[dict]
 
 
-def get_load_params(load_id: int, logger: RunLogger) -> dict:
+get_load_params_query = LazyDocument(
     """
-    Returns the parameters of an existing run.
-
-    :param load_id: The ID of an existing run whose parameters you want to access.
-    :param logger: A HasuraLogger object associated with the database where the run is stored.
-    """
-    return logger.execute(
-        gql(
-            """
 query GetParameters($id: Int!) {
 run_by_pk(id: $id) {
 metadata(path: "parameters")
 }
 }"""
-        ),
-        variable_values=dict(id=load_id),
-    )["run_by_pk"]["metadata"]
+)
+prefetch_load_params_query = LazyDocument(
+    """
+query GetParametersBulk($ids: [Int!]!) {
+run(where: {id: {_in: $ids}}) {
+id
+metadata(path: "parameters")
+}
+}"""
+)
+
+
+def get_load_params(
+    load_id: int, logger: RunLogger, cache: Optional[ParamsCache] = params_cache
+) -> dict:
+    """
+    Returns the parameters of an existing run.
+
+    :param load_id: The ID of an existing run whose parameters you want to access.
+    :param logger: A HasuraLogger object associated with the database where the run is stored.
+    :param cache: Where to look up the parameters before querying the database (and to store them after).
+        The default cache keeps entries in memory and, if the ``RUN_LOGGER_CACHE_DIR`` environment variable is set,
+        on disk in that directory, where they are shared between processes. If ``None``, the database is always queried.
+    """
+
+    def fetch():
+        return logger.execute(
+            get_load_params_query.document, variable_values=dict(id=load_id)
+        )["run_by_pk"]["metadata"]
+
+    if cache is None or logger.graphql_endpoint is None:
+        return fetch()
+    return cache.get_or_fetch(logger.graphql_endpoint, load_id, fetch)
+
+
+def prefetch_load_params(
+    load_ids: Iterable[int], logger: RunLogger, cache: ParamsCache = params_cache
+) -> Dict[int, dict]:
+    """
+    Fetches the parameters of many runs in a single query and stores them in ``cache``,
+    so that subsequent calls to :py:func:`get_load_params` for these runs do not query the database.
+    Runs that are already cached are not fetched again.
+
+    :param load_ids: The IDs of existing runs.
+    :param logger: A HasuraLogger object associated with the database where the runs are stored.
+    :param cache: The cache to fill.
+    :return: The parameters of each run that exists, by run ID.
+    """
+    endpoint = logger.graphql_endpoint
+    params = {}
+    missing = []
+    for load_id in dict.fromkeys(load_ids):
+        value = cache.get(endpoint, load_id)
+        if value is MISSING:
+            missing.append(load_id)
+        else:
+            params[load_id] = value
+    if missing:
+        runs = logger.execute(
+            prefetch_load_params_query.document, variable_values=dict(ids=missing)
+        )["run"]
+        for run in runs:
+            cache.put(endpoint, run["id"], run["metadata"])
+            params[run["id"]] = run["metadata"]
+    return params
+
+
+@dataclass
+class LogPage:
+    """
+    A page of ``run_log`` rows in columnar form, as yielded by :py:func:`read_logs`.
+
+    :param ids: The IDs of the rows, in ascending order.
+    :param columns: One array per key, aligned with ``ids``. Missing numeric values are ``nan``;
+        other columns with missing values have ``dtype=object`` and contain ``None``.
+    :param last_id: The ID of the last row fetched for this page (which may have been filtered out by ``steps``).
+        Pass it as ``after_id`` to continue reading from here.
+    """
+
+    ids: np.ndarray
+    columns: Dict[str, np.ndarray]
+    last_id: int
+
+    def __len__(self):
+        return len(self.ids)
+
+
+@lru_cache(maxsize=64)
+def _read_logs_query(keys: Optional[Tuple[str, ...]]) -> DocumentNode:
+    from gql import gql
+
+    if keys is None:
+        selection = "log"
+    else:
+        # project each key on the server, under an alias (keys need not be GraphQL names)
+        selection = "\n".join(
+            f"k{i}: log(path: {json.dumps(key)})" for i, key in enumerate(keys)
+        )
+    return gql(
+        f"""
+query ReadLogs($where: run_log_bool_exp!, $limit: Int!) {{
+run_log(where: $where, order_by: {{id: asc}}, limit: $limit) {{
+id
+{selection}
+}}
+}}"""
+    )
+
+
+def _column(values: List[Any]) -> np.ndarray:
+    present = [v for v in values if v is not None]
+    if len(present) < len(values) and all(
+        isinstance(v, (int, float)) and not isinstance(v, bool) for v in present
+    ):
+        return np.array([np.nan if v is None else v for v in values], dtype=float)
+    try:
+        column = np.array(values)
+    except ValueError:  # ragged lists
+        column = None
+    if column is None or column.dtype.kind in "OU" and len(present) < len(values):
+        column = np.empty(len(values), dtype=object)
+        column[:] = values
+    return column
+
+
+def read_logs(
+    run_id: int,
+    logger: RunLogger,
+    keys: Optional[Sequence[str]] = None,
+    steps: Optional[Tuple[Optional[float], Optional[float]]] = None,
+    step_key: str = "step",
+    after_id: int = 0,
+    page_size: int = 10000,
+) -> Iterator[LogPage]:
+    """
+    Reads the logs of a run, one page at a time, so that memory use does not grow with the number of rows::
+
+        for page in read_logs(run_id, logger, keys=["step", "loss"]):
+            plot(page.columns["step"], page.columns["loss"])
+
+    Pages are fetched with keyset pagination on the row ID, so each query is an index range scan
+    no matter how far into the run it starts.
+
+    :param run_id: The ID of the run.
+    :param logger: A RunLogger object associated with the database where the run is stored.
+    :param keys: The keys to fetch (projected on the server). If ``None``, all keys are fetched, and each page
+        has a column for every key that occurs in it.
+    :param steps: If provided, only rows whose ``step_key`` is in the half-open range ``[start, stop)`` are returned
+        (either bound may be ``None``). Rows without ``step_key`` are skipped on the server; rows whose step is
+        ``null`` and the range itself are checked on the client, so pages may hold fewer than ``page_size`` rows.
+    :param step_key: The key holding the step number.
+    :param after_id: Only rows with a greater ID are returned, e.g. the ``last_id`` of a previously read page.
+    :param page_size: The maximum number of rows fetched per query.
+    :return: An iterator of non-empty pages.
+    """
+    for page in _read_pages(run_id, logger, keys, steps, step_key, after_id, page_size):
+        if len(page):
+            yield page
+
+
+def _read_pages(
+    run_id: int,
+    logger: RunLogger,
+    keys: Optional[Sequence[str]] = None,
+    steps: Optional[Tuple[Optional[float], Optional[float]]] = None,
+    step_key: str = "step",
+    after_id: int = 0,
+    page_size: int = 10000,
+) -> Iterator[LogPage]:
+    # like read_logs, but also yields pages whose rows were all filtered out by steps
+    if keys is not None:
+        keys = list(dict.fromkeys(keys))
+    fetched = keys
+    if steps is not None and keys is not None and step_key not in keys:
+        fetched = keys + [step_key]
+    query = _read_logs_query(None if fetched is None else tuple(fetched))
+    where: Dict[str, Any] = dict(run_id={"_eq": run_id})
+    if steps is not None:
+        where.update(log={"_has_key": step_key})
+    start, stop = steps or (None, None)
+
+    while True:
+        where.update(id={"_gt": after_id})
+        rows = logger.execute(
+            query, variable_values=dict(where=where, limit=page_size)
+        )["run_log"]
+        if not rows:
+            return
+        after_id = rows[-1]["id"]
+        if fetched is None:
+            logs = [row["log"] for row in rows]
+        else:
+            logs = [
+                {key: row[f"k{i}"] for i, key in enumerate(fetched)} for row in rows
+            ]
+        ids = [row["id"] for row in rows]
+        if steps is not None:
+            kept = [
+                (id_, log)
+                for id_, log in zip(ids, logs)
+                # a null step (e.g. logged as NaN) is treated like a missing one
+                if log[step_key] is not None
+                and (start is None or log[step_key] >= start)
+                and (stop is None or log[step_key] < stop)
+            ]
+            ids = [id_ for id_, _ in kept]
+            logs = [log for _, log in kept]
+        columns_keys = keys
+        if columns_keys is None:
+            columns_keys = list(dict.fromkeys(key for log in logs for key in log))
+        columns = {key: _column([log.get(key) for log in logs]) for key in columns_keys}
+        yield LogPage(ids=np.array(ids, dtype=int), columns=columns, last_id=after_id)
+        if len(rows) < page_size:
+            return
+
+
+def tail_logs(
+    run_id: int,
+    logger: RunLogger,
+    after_id: int = 0,
+    poll_interval: float = 5.0,
+    **kwargs,
+) -> Iterator[LogPage]:
+    """
+    Follows the logs of a run as they are written: like :py:func:`read_logs`, but when all existing rows have been read,
+    polls every ``poll_interval`` seconds for rows with a greater ID (and never returns).
+    Each poll fetches only the new rows.
+
+    :param after_id: See :py:func:`read_logs`, e.g. the ``last_id`` of the last page already displayed.
+    :param poll_interval: Seconds to wait between queries once there are no new rows.
+    :param kwargs: Passed to :py:func:`read_logs`.
+    """
+    while True:
+        for page in _read_pages(run_id, logger, after_id=after_id, **kwargs):
+            # rows filtered out by steps are not fetched again
+            after_id = page.last_id
+            if len(page):
+                yield page
+        time.sleep(poll_interval)
 
 
 def create_run(
@@ -68,7 +304,9 @@ def create_run(
     if logger is not None:
         if charts is None:
             charts = []
-        logger.create_run(metadata=metadata, sweep_id=sweep_id, charts=charts)
+        sweep_params = logger.create_run(
+            metadata=metadata, sweep_id=sweep_id, charts=charts
+        )
 
     if load_id is not None:
         load_params = get_load_params(load_id=load_id, logger=logger)
@@ -80,6 +318,13 @@ def create_run(
     )
 
 
+def _merge_params(new_params: NewParams, params: dict) -> dict:
+    for p in astuple(new_params):
+        if p is not None:
+            params.update(p)
+    return params
+
+
 def update_params(
     logger: Optional[RunLogger],
     new_params: NewParams,
@@ -108,10 +353,7 @@ def update_params(
     :return: Updated parameters.
     """
 
-    for p in astuple(new_params):
-        if p is not None:
-            params.update(p)
-
+    params = _merge_params(new_params, params)
     if logger is not None:
         logger.update_metadata(dict(parameters=params, run_id=logger.run_id, name=name))
     return params
@@ -125,6 +367,8 @@ def initialize(
     name: Optional[str] = None,
     sweep_id: Optional[int] = None,
     load_id: Optional[int] = None,
+    wal_dir: Optional[Union[Path, str]] = None,
+    relay: Optional[str] = None,
     **params,
 ) -> Tuple[dict, Optional[RunLogger]]:
     """
@@ -132,6 +376,11 @@ def initialize(
     It creates a new run and returns the parameters and a HasuraLogger object, which
     is a handle for accessing the database.
 
+    Parameters are resolved as in :py:func:`create_run <run_logger.main.create_run>` followed by
+    :py:func:`update_params <run_logger.main.update_params>`, but unless the run is enrolled in a sweep,
+    the run is inserted with its final metadata in a single API call (loaded parameters come from the cache
+    described in :py:func:`get_load_params <run_logger.main.get_load_params>` when available).
+
     :param graphql_endpoint: The endpoint of the Hasura GraphQL API, e.g. ``https://server.university.edu:1200/v1/graphql``. If this value is ``None``, the run will not be logged in the database.
     :param config: An optional path to a ``yaml`` config file file containing parameters. See the section on :ref:`Config files` for more details.
     :param charts: A list of `Vega <https://vega.github.io/>`_ or `Vega-Lite <https://vega.github.io/vega-lite/>`_ graphical specifications, to be displayed by `run-visualizer <https://github.com/run-tracker/run-visualizer>`_.
@@ -139,22 +388,43 @@ def initialize(
     :param name: An optional name to be given to the run.
     :param sweep_id: An optional sweep ID, to enroll this run in a sweep.
     :param load_id: An optional run ID, to load parameters from an existing run.
+    :param wal_dir: If provided, the run is logged offline to files in this directory (see :py:class:`LocalClient <run_logger.wal.LocalClient>`) instead of ``graphql_endpoint``. Use ``run-logger upload`` to send them to Hasura later.
+    :param relay: If provided, the run is logged through the node-local relay at this address (see :py:class:`RelayClient <run_logger.relay.RelayClient>`) instead of ``graphql_endpoint``.
     :param params: Existing (usually default) parameters provided for the run (and updated by :py:func:`update_params <run_logger.main.update_params>`).
     :return: A tuple of parameters and a HasuraLogger object.
     """
-    logger = RunLogger(graphql_endpoint)
-    new_params = create_run(
-        logger=logger,
-        config=config,
-        charts=charts,
-        metadata=metadata,
-        sweep_id=sweep_id,
-        load_id=load_id,
+    if wal_dir is not None:
+        logger = RunLogger(graphql_endpoint, client=LocalClient(wal_dir))
+    elif relay is not None:
+        logger = RunLogger(graphql_endpoint, client=RelayClient(relay))
+    elif graphql_endpoint is not None:
+        logger = RunLogger(graphql_endpoint)
+    else:
+        logger = None
+    if config is None:
+        config = {}
+    load_params = None
+    if load_id is not None:
+        load_params = get_load_params(load_id=load_id, logger=logger)
+    new_params = NewParams(
+        config_params=config, sweep_params=None, load_params=load_params
     )
-    params = update_params(
-        logger=logger,
-        new_params=new_params,
-        name=name,
-        **params,
+    if logger is None:
+        return _merge_params(new_params, params), logger
+
+    # Resolve the parameters before creating the run, so that the run is inserted with its final metadata.
+    # Only the run ID (unknown until the run is inserted) is appended later, on the logger's next flush.
+    # Sweep parameters are assigned by the insert itself, so sweep runs still need an immediate update.
+    metadata = dict(metadata or {}, name=name)
+    if sweep_id is None:
+        params = _merge_params(new_params, params)
+        metadata.update(parameters=params)
+    new_params.sweep_params = logger.create_run(
+        metadata=metadata, sweep_id=sweep_id, charts=charts or []
     )
+    if sweep_id is None:
+        logger.update_metadata(dict(run_id=logger.run_id), defer=True)
+    else:
+        params = _merge_params(new_params, params)
+        logger.update_metadata(dict(parameters=params, run_id=logger.run_id))
     return params, logger
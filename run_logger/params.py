@@ -1,30 +1,29 @@
-from typing import Any, Iterable, Mapping, Tuple
+from bisect import bisect_right
+from itertools import accumulate
+from typing import (
+    TYPE_CHECKING,
+    Any,
+    Dict,
+    Iterable,
+    Iterator,
+    List,
+    Mapping,
+    Tuple,
+    Union,
+)
 
-import numpy as np
+# numpy is only needed for sampling, so it is imported there, keeping this module cheap to import
+if TYPE_CHECKING:
+    import numpy as np
 
 ParamChoice = Tuple[str, Iterable]
 
 
 def param_generator(params: Any):
-    if isinstance(params, Mapping):
-        if tuple(params.keys()) == ("",):
-            yield from param_generator(params[""])
-            return
-        if not params:
-            yield {}
-        else:
-            (key, value), *params = params.items()
-            for choice in param_generator(value):
-                for other_choices in param_generator(dict(params)):
-                    yield {key: choice, **other_choices}
-    elif isinstance(params, (list, tuple)):
-        for choices in params:
-            yield from param_generator(choices)
-    else:
-        yield params
+    yield from ParamGrid(params)
 
 
-def param_sampler(params: Any, rng: np.random.Generator):
+def param_sampler(params: Any, rng: "np.random.Generator"):
     if isinstance(params, Mapping):
         if tuple(params.keys()) == ("",):
             return param_sampler(params[""], rng)
@@ -33,3 +32,195 @@ def param_sampler(params: Any, rng: np.random.Generator):
         return param_sampler(params[rng.choice(len(params))], rng)
     else:
         return params
+
+
+class _Leaf:
+    def __init__(self, value: Any):
+        self.value = value
+        self.size = 1
+
+    def decode(self, index: int) -> Any:
+        return self.value
+
+    def sample(self, rng: "np.random.Generator", n: int) -> "np.ndarray":
+        import numpy as np
+
+        samples = np.empty(n, dtype=object)
+        samples.fill(self.value)
+        return samples
+
+
+class _Choice:
+    # a list of alternatives: the grid is the concatenation of the alternatives' grids
+    def __init__(self, children: List[Any]):
+        self.children = children
+        self.starts = [0, *accumulate(child.size for child in children)]
+        self.size = self.starts.pop()
+
+    def decode(self, index: int) -> Any:
+        i = bisect_right(self.starts, index) - 1
+        return self.children[i].decode(index - self.starts[i])
+
+    def sample(self, rng: "np.random.Generator", n: int) -> "np.ndarray":
+        import numpy as np
+
+        # like param_sampler, choose uniformly among alternatives (regardless of their sizes)
+        choices = rng.integers(len(self.children), size=n)
+        samples = np.empty(n, dtype=object)
+        for i, child in enumerate(self.children):
+            mask = choices == i
+            count = np.count_nonzero(mask)
+            if count:
+                samples[mask] = child.sample(rng, count)
+        return samples
+
+
+class _Product:
+    # a mapping: the grid is the Cartesian product of the values' grids, first key varying slowest
+    def __init__(self, keys: List[Any], children: List[Any]):
+        self.keys = keys
+        self.children = children
+        self.size = 1
+        for child in children:
+            self.size *= child.size
+        # as in param_generator, the choices of a last "" key (beside other keys) are merged into the mapping
+        self.merge_last = len(keys) > 1 and keys[-1] == ""
+
+    def decode(self, index: int) -> dict:
+        values = []
+        for child in reversed(self.children):
+            index, digit = divmod(index, child.size)
+            values.append(child.decode(digit))
+        values.reverse()
+        if not self.merge_last:
+            return dict(zip(self.keys, values))
+        *values, last = values
+        if not isinstance(last, Mapping):
+            raise TypeError(
+                f"The choices of a last '' key must be mappings, got {last!r}"
+            )
+        return {**dict(zip(self.keys, values)), **last}
+
+    def sample(self, rng: "np.random.Generator", n: int) -> "np.ndarray":
+        import numpy as np
+
+        columns = [child.sample(rng, n) for child in self.children]
+        samples = np.empty(n, dtype=object)
+        for i, row in enumerate(zip(*columns)):
+            samples[i] = dict(zip(self.keys, row))
+        return samples
+
+
+def _compile(params: Any):
+    if isinstance(params, Mapping):
+        if tuple(params.keys()) == ("",):
+            return _compile(params[""])
+        return _Product(list(params.keys()), [_compile(v) for v in params.values()])
+    elif isinstance(params, (list, tuple)):
+        return _Choice([_compile(choices) for choices in params])
+    else:
+        return _Leaf(params)
+
+
+class ParamGrid:
+    """
+    The combinations generated by :py:func:`param_generator`, in the same order, but addressable by index
+    (as in :py:func:`param_generator`, when a mapping's last key is ``""``, the mappings chosen for it are merged into it):
+    combination ``i`` is decoded directly from ``i`` (in mixed radix, one digit per mapping key and
+    one offset per list), in time proportional to the size of the config rather than the size of the grid.
+
+    >>> grid = ParamGrid({"lr": [1e-3, 1e-4], "model": [{"depth": [2, 4]}, {"width": 8}]})
+    >>> len(grid)
+    6
+    >>> grid[3]
+    {'lr': 0.0001, 'model': {'depth': 2}}
+
+    :param params: A sweep config, as accepted by :py:func:`param_generator`.
+    """
+
+    def __init__(self, params: Any):
+        self.root = _compile(params)
+
+    @property
+    def size(self) -> int:
+        """
+        The number of combinations (unlike ``len``, not limited to ``sys.maxsize``).
+        """
+        return self.root.size
+
+    def __len__(self):
+        return self.size
+
+    def __getitem__(self, index: int) -> Any:
+        if index < 0:
+            index += self.size
+        if not 0 <= index < self.size:
+            raise IndexError(f"index {index} out of range for grid of size {self.size}")
+        return self.root.decode(index)
+
+    def __iter__(self) -> Iterator[Any]:
+        for index in range(self.size):
+            yield self.root.decode(index)
+
+
+class ParamSampler:
+    """
+    Draws many configurations at once from the same distribution as :py:func:`param_sampler`.
+    The config is compiled once; each draw of ``n`` configurations then makes one vectorized
+    ``rng.integers`` call per list in the config (instead of one ``rng.choice`` call per list per configuration).
+
+    >>> sampler = ParamSampler({"lr": [1e-3, 1e-4], "depth": [2, 4, 8]}, rng=0)
+    >>> columns = sampler.columns(1000)
+    >>> sorted(set(columns["depth"].tolist()))
+    [2, 4, 8]
+
+    :param params: A sweep config, as accepted by :py:func:`param_sampler`.
+    :param rng: A ``np.random.Generator`` or a seed, e.g. :py:attr:`RunLogger.seed <run_logger.run.RunLogger>`.
+    """
+
+    def __init__(
+        self, params: Any, rng: Union[int, "np.random.Generator", None] = None
+    ):
+        import numpy as np
+
+        self.root = _compile(params)
+        self.rng = np.random.default_rng(rng)
+
+    def sample(self, n: int) -> List[Any]:
+        """
+        :return: ``n`` independently sampled configurations.
+        """
+        return self.root.sample(self.rng, n).tolist()
+
+    def __iter__(self) -> Iterator[Any]:
+        """
+        Lazily yield configurations forever, drawing them in batches.
+        """
+        batch_size = 1
+        while True:
+            yield from self.sample(batch_size)
+            batch_size = min(2 * batch_size, 1024)
+
+    def columns(self, n: int) -> Dict[Any, "np.ndarray"]:
+        """
+        Sample ``n`` configurations of a config whose top level is a mapping, as one array per key.
+        Columns of numbers, booleans or strings get the corresponding dtype; other columns
+        (e.g. nested mappings or mixed types) are object arrays.
+        """
+        if not isinstance(self.root, _Product):
+            raise ValueError("columns requires a config whose top level is a mapping")
+        return {
+            key: _as_column(child.sample(self.rng, n))
+            for key, child in zip(self.root.keys, self.root.children)
+        }
+
+
+def _as_column(samples: "np.ndarray") -> "np.ndarray":
+    # only values of a single type get a typed column: numpy would coerce e.g. [1, "x"] to strings
+    # and [True, 2] to integers
+    kinds = {type(v) for v in samples}
+    if len(kinds) != 1 or not kinds <= {bool, int, float, str}:
+        return samples
+    import numpy as np
+
+    return np.array(samples.tolist())
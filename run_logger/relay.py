@@ -0,0 +1,387 @@
+import json
+import logging
+import os
+import signal
+import socket
+import socketserver
+import threading
+import uuid
+from pathlib import Path
+from typing import Any, Dict, Optional, Tuple, Union
+
+from graphql import DocumentNode, print_ast
+
+from run_logger.background import BackgroundFlusher
+from run_logger.batching import FlushPolicy
+from run_logger.documents import operation_name
+from run_logger.retry import SpillQueue, default_spill_dir
+from run_logger.run import Client, RunLogger, jsonify
+
+# mutations whose rows the relay merges into cross-run batches, and the key of their response
+_BATCHED = dict(
+    insert_run_logs=("log", "insert_run_log"),
+    insert_run_blobs=("blob", "insert_run_blob"),
+)
+# mutations that are forwarded without waiting for the upstream response
+_FIRE_AND_FORGET = ("update_metadata",)
+
+
+def parse_address(address: str) -> Tuple[int, Any]:
+    """
+    :param address: A Unix socket path (anything containing a ``/``) or ``host:port``.
+    :return: The socket family and address.
+    """
+    if "/" in address:
+        return socket.AF_UNIX, address
+    host, port = address.rsplit(":", 1)
+    return socket.AF_INET, (host, int(port))
+
+
+class RelayClient:
+    """
+    A drop-in replacement for :py:class:`Client <run_logger.run.Client>` that sends runs, metadata updates,
+    logs and blobs to a node-local :py:class:`Relay` instead of Hasura::
+
+        logger = RunLogger(graphql_endpoint=None, client=RelayClient("/tmp/run-logger.sock"))
+
+    Logs, blobs and metadata updates are written to the relay's socket without waiting for a response,
+    so they cost the caller a few microseconds; the relay batches and forwards them. Other operations
+    (e.g. creating runs) wait for the relay to forward them and return the upstream response.
+    :py:meth:`replay` (called by :py:meth:`RunLogger.flush <run_logger.run.RunLogger.flush>`) waits until the relay has
+    forwarded everything sent before it.
+
+    If the connection to the relay is lost (e.g. because the relay restarted), the client reconnects.
+    If the relay cannot be reached, mutations sent with ``spill=True`` (logs, blobs and metadata updates)
+    are spilled to a file in ``spill_dir``, as by :py:class:`Client <run_logger.run.Client>`, and replayed by
+    :py:meth:`replay`; other operations raise ``ConnectionError``.
+
+    :param address: The relay's address: a Unix socket path or ``host:port``.
+    :param spill_dir: Directory in which mutations are spilled while the relay is unreachable.
+        Defaults to the default ``spill_dir`` of :py:class:`Client <run_logger.run.Client>`
+        (``$RUN_LOGGER_SPILL_DIR`` or ``~/.cache/run-logger/spill``), read when the client is created.
+    :param spill: If ``False``, mutations are never spilled: they raise ``ConnectionError`` instead.
+    """
+
+    def __init__(
+        self,
+        address: str,
+        spill_dir: Optional[Union[Path, str]] = None,
+        spill: bool = True,
+    ):
+        self.address = address
+        self.spill_dir = None
+        if spill:
+            self.spill_dir = default_spill_dir() if spill_dir is None else spill_dir
+        self._lock = threading.Lock()
+        self._socket: Optional[socket.socket] = None
+        self._reader = None
+        self._pid = None
+        self._spill_queue: Optional[SpillQueue] = None
+        self._spill_queue_pid = None
+        self._sources: Dict[int, Tuple[DocumentNode, str]] = {}
+
+    def execute(self, query: DocumentNode, variable_values: dict, spill: bool = False):
+        spill_queue = self._get_spill_queue() if spill else None
+        if spill_queue is not None and len(spill_queue):
+            # preserve the order of mutations
+            spill_queue.append(query, jsonify(variable_values))
+            return None
+        try:
+            return self._execute(query, variable_values)
+        except ConnectionError as e:
+            if spill_queue is None:
+                raise
+            logging.warning(f"Spilling mutation to {spill_queue.path}: {e!r}")
+            spill_queue.append(query, jsonify(variable_values))
+            return None
+
+    def _execute(self, query: DocumentNode, variable_values: dict):
+        name = operation_name(query)
+        variable_values = jsonify(variable_values)
+        if name in _BATCHED:
+            kind, key = _BATCHED[name]
+            objects = variable_values["objects"]
+            self._send(dict(kind=kind, objects=objects), reply=False)
+            return {key: dict(affected_rows=len(objects))}
+        reply = name not in _FIRE_AND_FORGET
+        frame = dict(
+            kind="execute",
+            query=self._source(query),
+            variables=variable_values,
+            reply=reply,
+        )
+        return self._send(frame, reply=reply)
+
+    def replay(self) -> int:
+        sent = 0
+        spill_queue = self._get_spill_queue()
+        if spill_queue is not None:
+            sent = spill_queue.replay(
+                self._execute, lambda e: isinstance(e, ConnectionError)
+            )
+        try:
+            self._send(dict(kind="flush"), reply=True)
+        except ConnectionError as e:
+            logging.warning(f"Unable to flush relay: {e!r}")
+        return sent
+
+    def close(self):
+        with self._lock:
+            self._disconnect()
+
+    def _get_spill_queue(self) -> Optional[SpillQueue]:
+        # each process gets its own queue, like Client
+        if self.spill_dir is None:
+            return None
+        if self._spill_queue is None or self._spill_queue_pid != os.getpid():
+            self._spill_queue = SpillQueue(
+                Path(self.spill_dir) / f"{os.getpid()}-{uuid.uuid4().hex}.jsonl"
+            )
+            self._spill_queue_pid = os.getpid()
+        return self._spill_queue
+
+    def _source(self, query: DocumentNode) -> str:
+        # documents are printed once; keeping them alive keeps their ids unique
+        entry = self._sources.get(id(query))
+        if entry is None:
+            entry = self._sources[id(query)] = query, print_ast(query)
+        return entry[1]
+
+    def _send(self, frame: dict, reply: bool):
+        line = json.dumps(frame).encode() + b"\n"
+        with self._lock:
+            for attempt in range(2):
+                try:
+                    if self._socket is not None and self._closed_by_relay():
+                        self._disconnect()
+                    if self._socket is None or self._pid != os.getpid():
+                        self._connect()
+                    self._socket.sendall(line)
+                    break
+                except OSError as e:
+                    # e.g. the relay restarted: reconnect once
+                    self._disconnect()
+                    if attempt:
+                        raise ConnectionError(
+                            f"Relay at {self.address} is unreachable: {e!r}"
+                        ) from e
+            if not reply:
+                return None
+            try:
+                response = self._reader.readline()
+            except OSError:
+                response = b""
+            if not response:
+                # the request may have been forwarded, so it is not sent again
+                self._disconnect()
+                raise ConnectionError(f"Relay at {self.address} closed the connection")
+        response = json.loads(response)
+        if "error" in response:
+            raise RuntimeError(f"Relay at {self.address}: {response['error']}")
+        return response["data"]
+
+    def _connect(self):
+        # a socket inherited across fork is shared with the parent, so each process opens its own
+        family, address = parse_address(self.address)
+        self._socket = socket.socket(family, socket.SOCK_STREAM)
+        self._pid = os.getpid()
+        if family == socket.AF_INET:
+            self._socket.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        self._socket.connect(address)
+        self._reader = self._socket.makefile("rb")
+
+    def _disconnect(self):
+        if self._socket is not None and self._pid == os.getpid():
+            if self._reader is not None:
+                self._reader.close()
+            self._socket.close()
+        self._socket = self._reader = None
+
+    def _closed_by_relay(self) -> bool:
+        # The relay never sends anything unsolicited, so a readable socket means it was closed.
+        # Checked before sending, because the first send to a closed socket appears to succeed.
+        try:
+            return not self._socket.recv(1, socket.MSG_PEEK | socket.MSG_DONTWAIT)
+        except BlockingIOError:
+            return False
+        except OSError:
+            return True
+
+
+class _Handler(socketserver.StreamRequestHandler):
+    def setup(self):
+        # responses are small and latency-sensitive (Nagle's algorithm does not apply to Unix sockets)
+        self.disable_nagle_algorithm = self.request.family == socket.AF_INET
+        super().setup()
+        with self.server.relay._lock:
+            self.server.relay._connections.add(self.request)
+
+    def handle(self):
+        try:
+            for line in self.rfile:
+                response = self.server.relay.handle(json.loads(line))
+                if response is not None:
+                    self.wfile.write(json.dumps(response).encode() + b"\n")
+        except OSError:
+            pass  # closed by Relay.close or by the client
+
+    def finish(self):
+        with self.server.relay._lock:
+            self.server.relay._connections.discard(self.request)
+        super().finish()
+
+
+class Relay:
+    """
+    A node-local relay between many :py:class:`RelayClient` objects (e.g. one per training process) and Hasura.
+    Logs and blobs from all runs are merged into large batches (according to ``log_policy`` and ``blob_policy``)
+    and forwarded over a single pooled :py:class:`Client <run_logger.run.Client>`, so the upstream request rate
+    does not grow with the number of processes. Forwarded mutations that fail are spilled by the client
+    (see :py:meth:`Client.execute <run_logger.run.Client.execute>`).
+
+    :param graphql_endpoint: The endpoint of the Hasura GraphQL API.
+    :param address: The address to listen on: a Unix socket path or ``host:port``.
+    :param log_policy: Determines when merged logs are forwarded. Defaults to 1000 rows or 0.5 seconds.
+    :param blob_policy: Like ``log_policy``, for blobs. Defaults to 1000 rows, 16 MiB or 0.5 seconds.
+    :param max_queue_size: Maximum number of rows waiting to be forwarded. Beyond that, reading from clients blocks.
+    :param client: A :py:class:`Client <run_logger.run.Client>` to use instead of the default one.
+    """
+
+    def __init__(
+        self,
+        graphql_endpoint: str,
+        address: str,
+        log_policy: Optional[FlushPolicy] = None,
+        blob_policy: Optional[FlushPolicy] = None,
+        max_queue_size: int = 100000,
+        client: Optional[Client] = None,
+    ):
+        if log_policy is None:
+            log_policy = FlushPolicy(max_rows=1000, max_latency=0.5)
+        if blob_policy is None:
+            blob_policy = FlushPolicy(
+                max_rows=1000, max_bytes=16 << 20, max_latency=0.5
+            )
+        self.address = address
+        self.client = client or Client(graphql_endpoint=graphql_endpoint)
+        self.flusher = BackgroundFlusher(
+            send=self._insert,
+            policies=dict(log=log_policy, blob=blob_policy),
+            max_queue_size=max_queue_size,
+        )
+        self._documents: Dict[str, DocumentNode] = {}
+        self._connections = set()
+        self._lock = threading.Lock()
+        family, address = parse_address(address)
+        if family == socket.AF_UNIX:
+            # a socket file left behind by a relay that was killed would make bind fail
+            Path(address).unlink(missing_ok=True)
+            server_class = socketserver.ThreadingUnixStreamServer
+        else:
+            server_class = socketserver.ThreadingTCPServer
+        self.server = server_class(address, _Handler, bind_and_activate=False)
+        self.server.allow_reuse_address = True
+        self.server.daemon_threads = True
+        self.server.relay = self
+        self.server.server_bind()
+        self.server.server_activate()
+        self._serving_thread: Optional[threading.Thread] = None
+
+    def serve_forever(self):
+        logging.info(f"Relaying {self.address} to {self.client.graphql_endpoint}")
+        self._serving_thread = threading.current_thread()
+        self.server.serve_forever()
+
+    def close(self):
+        """
+        Stop accepting connections and forward all pending rows.
+        """
+        thread = self._serving_thread
+        if thread is not None and thread is not threading.current_thread():
+            self.server.shutdown()
+        self.server.server_close()
+        # clients reconnect (or spill) once their connection is closed
+        with self._lock:
+            connections = list(self._connections)
+        for connection in connections:
+            try:
+                connection.shutdown(socket.SHUT_RDWR)
+            except OSError:
+                pass
+        self.flusher.close()
+        self.client.replay()
+        family, address = parse_address(self.address)
+        if family == socket.AF_UNIX:
+            Path(address).unlink(missing_ok=True)
+
+    def handle(self, frame: dict) -> Optional[dict]:
+        """
+        Handle a frame sent by a :py:class:`RelayClient`.
+
+        :return: The response to send back, if the client expects one.
+        """
+        kind = frame["kind"]
+        if kind in ("log", "blob"):
+            for row in frame["objects"]:
+                self.flusher.put(kind, row)
+            return None
+        if kind == "flush":
+            self.flusher.flush()
+            self.client.replay()
+            return dict(data=None)
+        reply = frame["reply"]
+        try:
+            data = self.client.execute(
+                self._document(frame["query"]), frame["variables"], spill=not reply
+            )
+        except Exception as e:
+            if not reply:
+                logging.exception("Failed to forward mutation")
+                return None
+            return dict(error=repr(e))
+        return dict(data=data) if reply else None
+
+    def _document(self, source: str) -> DocumentNode:
+        document = self._documents.get(source)
+        if document is None:
+            from gql import gql
+
+            document = self._documents[source] = gql(source)
+        return document
+
+    def _insert(self, kind: str, objects: list):
+        mutation = {
+            "log": RunLogger.insert_run_logs_mutation,
+            "blob": RunLogger.insert_run_blobs_mutation,
+        }[kind]
+        self.client.execute(mutation, variable_values=dict(objects=objects), spill=True)
+
+
+def serve(
+    address: str,
+    graphql_endpoint: str,
+    max_rows: int,
+    max_latency: float,
+):
+    """
+    Run a :py:class:`Relay` until ``SIGTERM`` or ``SIGINT``, then forward all pending rows.
+    """
+    relay = Relay(
+        graphql_endpoint=graphql_endpoint,
+        address=address,
+        log_policy=FlushPolicy(max_rows=max_rows, max_latency=max_latency),
+        blob_policy=FlushPolicy(
+            max_rows=max_rows, max_bytes=16 << 20, max_latency=max_latency
+        ),
+    )
+
+    def stop(signum, frame):
+        raise KeyboardInterrupt
+
+    signal.signal(signal.SIGTERM, stop)
+    try:
+        relay.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        relay.close()
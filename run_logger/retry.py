@@ -0,0 +1,218 @@
+import json
+import logging
+import os
+import random
+import re
+import shutil
+import threading
+from dataclasses import dataclass
+from pathlib import Path
+from typing import BinaryIO, Callable, Optional, Union
+
+import requests
+from gql import gql
+from gql.transport.exceptions import (
+    TransportClosed,
+    TransportProtocolError,
+    TransportServerError,
+)
+from graphql import DocumentNode, print_ast
+
+
+@dataclass
+class RetryPolicy:
+    """
+    Determines how :py:class:`Client <run_logger.run.Client>` retries failed requests.
+
+    :param max_attempts: Maximum number of attempts per request (including the first one).
+    :param initial_backoff: Delay (in seconds) before the first retry.
+    :param max_backoff: Upper bound (in seconds) on the delay between attempts, which otherwise doubles after every attempt.
+    :param jitter: Fraction of each delay that is randomized, so that many clients do not retry in lockstep.
+    """
+
+    max_attempts: int = 5
+    initial_backoff: float = 0.5
+    max_backoff: float = 30.0
+    jitter: float = 0.5
+
+    def backoff(self, attempt: int) -> float:
+        """
+        :param attempt: The number of attempts made so far (starting from 1).
+        :return: The number of seconds to wait before the next attempt.
+        """
+        delay = min(self.max_backoff, self.initial_backoff * 2 ** (attempt - 1))
+        return delay * (1 - self.jitter * random.random())
+
+    @staticmethod
+    def is_retryable(exception: Exception) -> bool:
+        """
+        Transient failures (connection errors, timeouts, 5xx and 429 responses, malformed responses)
+        are retryable. GraphQL errors returned by the server (e.g. constraint violations) are not,
+        since sending the same request again would fail the same way.
+        """
+        if isinstance(exception, TransportServerError):
+            return (
+                exception.code is None or exception.code >= 500 or exception.code == 429
+            )
+        return isinstance(
+            exception,
+            (
+                requests.ConnectionError,
+                requests.Timeout,
+                TransportProtocolError,
+                TransportClosed,
+            ),
+        )
+
+
+def default_spill_dir() -> Path:
+    return Path(
+        os.getenv(
+            "RUN_LOGGER_SPILL_DIR", Path.home() / ".cache" / "run-logger" / "spill"
+        )
+    )
+
+
+# the files written by the SpillQueue of each Client: f"{pid}-{uuid}.jsonl"
+_SPILL_FILE = re.compile(r"(\d+)-[0-9a-f]+\.jsonl")
+
+
+class SpillQueue:
+    """
+    An append-only file of mutations that could not be sent, to be replayed later in the
+    order in which they were spilled.
+
+    Mutations that fail with an error that is not retryable (e.g. a constraint violation) are moved to a
+    dead-letter file next to it (``path`` with a ``.failed.jsonl`` suffix) instead of blocking the queue.
+    If the process exits before the queue is replayed (e.g. it crashes), replay the file with
+    ``run-logger replay`` (see :py:func:`replay_spilled`).
+
+    :param path: The file in which spilled mutations are stored, one JSON object per line.
+    """
+
+    def __init__(self, path: Path):
+        self.path = path
+        # guards the file and _length; not held while replayed mutations are sent
+        self._lock = threading.Lock()
+        self._replay_lock = threading.Lock()
+        self._length = 0
+        if path.exists():
+            with path.open() as f:
+                self._length = sum(1 for _ in f)
+
+    def __len__(self):
+        return self._length
+
+    def append(self, query: DocumentNode, variable_values: dict):
+        line = json.dumps(dict(query=print_ast(query), variable_values=variable_values))
+        with self._lock:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            with self.path.open("a") as f:
+                f.write(line + "\n")
+            self._length += 1
+
+    @property
+    def dead_letter_path(self) -> Path:
+        return self.path.with_suffix(".failed.jsonl")
+
+    def replay(
+        self,
+        execute: Callable[[DocumentNode, dict], dict],
+        is_retryable: Callable[[Exception], bool] = RetryPolicy.is_retryable,
+    ) -> int:
+        """
+        Send spilled mutations in order, stopping at the first retryable failure.
+        Mutations that fail otherwise are moved to :py:attr:`dead_letter_path`.
+        The file is read one mutation at a time, and mutations may be appended while it is replayed
+        (they are replayed too).
+
+        :param execute: Called with each mutation and its variable values.
+        :param is_retryable: Classifies failures, e.g. :py:meth:`RetryPolicy.is_retryable`.
+        :return: The number of mutations sent.
+        """
+        with self._replay_lock:
+            with self._lock:
+                if not self._length:
+                    return 0
+                f = self.path.open("rb")
+            sent = 0
+            with f:
+                while True:
+                    with self._lock:
+                        line = f.readline()
+                        if not line:
+                            f.close()
+                            self.path.unlink()
+                            self._length = 0
+                            return sent
+                    entry = json.loads(line)
+                    try:
+                        execute(gql(entry["query"]), entry["variable_values"])
+                    except Exception as e:
+                        if is_retryable(e):
+                            with self._lock:
+                                logging.warning(
+                                    f"Failed to replay mutation from {self.path}: {e!r}; "
+                                    f"{self._length} mutations remain spilled"
+                                )
+                                self._truncate(f, f.tell() - len(line))
+                            return sent
+                        logging.error(
+                            f"Moving mutation that failed with {e!r} from {self.path} to {self.dead_letter_path}"
+                        )
+                        with self.dead_letter_path.open("a") as dead_letters:
+                            dead_letters.write(
+                                json.dumps(dict(entry, error=repr(e))) + "\n"
+                            )
+                    else:
+                        sent += 1
+                    with self._lock:
+                        self._length -= 1
+
+    def _truncate(self, f: BinaryIO, offset: int):
+        # drop the mutations before offset, which have been replayed
+        f.seek(offset)
+        tmp = self.path.with_suffix(".tmp")
+        with tmp.open("wb") as out:
+            shutil.copyfileobj(f, out)
+        os.replace(tmp, self.path)
+
+
+def replay_spilled(
+    graphql_endpoint: str, spill_dir: Optional[Union[Path, str]] = None
+) -> int:
+    """
+    Replay the spill queues left behind by processes that exited before replaying them (e.g. because they crashed).
+    Queues of processes that are still running are skipped.
+
+    :param graphql_endpoint: The endpoint of the Hasura GraphQL API.
+    :param spill_dir: The directory of the queues. Defaults to the default ``spill_dir`` of
+        :py:class:`Client <run_logger.run.Client>`.
+    :return: The number of mutations sent.
+    """
+    from run_logger.run import Client
+
+    client = Client(graphql_endpoint=graphql_endpoint, spill_dir=None)
+    spill_dir = default_spill_dir() if spill_dir is None else Path(spill_dir)
+    sent = 0
+    for path in sorted(spill_dir.glob("*.jsonl")):
+        match = _SPILL_FILE.fullmatch(path.name)
+        if match is None or _is_running(int(match.group(1))):
+            continue
+        queue = SpillQueue(path)
+        n = queue.replay(client.execute, client.retry_policy.is_retryable)
+        logging.info(f"Replayed {n} mutations from {path}")
+        sent += n
+    return sent
+
+
+def _is_running(pid: int) -> bool:
+    if pid == os.getpid():
+        return True
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:  # running, as another user
+        return True
+    return True
@@ -1,12 +1,47 @@
+import json
+import logging
+import os
+import threading
 import time
-from dataclasses import dataclass
+import uuid
+from dataclasses import dataclass, field
 from pathlib import Path
-from typing import List, Optional
+from typing import (
+    TYPE_CHECKING,
+    Callable,
+    Dict,
+    Iterable,
+    List,
+    Mapping,
+    Optional,
+    Tuple,
+    Union,
+)
 
 import numpy as np
 from gql import Client as GQLClient
-from gql import gql
-from gql.transport.requests import RequestsHTTPTransport
+from graphql import DocumentNode
+
+from run_logger import fork, shutdown
+from run_logger.aggregate import AggregationPolicy, Aggregator
+from run_logger.background import BackgroundFlusher
+from run_logger.batching import Buffer, FlushPolicy, split
+from run_logger.blobs import BlobSource, blob_rows
+from run_logger.documents import LazyDocument, operation_name
+from run_logger.params import ParamGrid, param_sampler
+from run_logger.retry import RetryPolicy, SpillQueue, default_spill_dir
+from run_logger.stats import ExecuteEvent, Stats
+from run_logger.transport import PooledHTTPTransport
+
+if TYPE_CHECKING:
+    from run_logger.handle import RunHandle
+
+
+# parameter choices of each sweep, keyed by (graphql_endpoint, sweep_id)
+sweep_configs: Dict[Tuple[Optional[str], int], Tuple[dict, ParamGrid]] = {}
+
+# types that are already JSON-compatible and can be returned as-is
+_JSON_PRIMITIVES = frozenset([str, int, bool, type(None)])
 
 
 def jsonify(value):
@@ -21,7 +56,25 @@ def jsonify(value):
     :param value: a ``str``, ``Path``, ``np.ndarray``, ``dict``, or ``Iterable``.
     :return: value converted to JSON-serializable object
     """
-    if isinstance(value, str):
+    kind = type(value)
+    if kind in _JSON_PRIMITIVES:
+        return value
+    elif kind is float:
+        return None if value != value else value
+    elif kind is dict:
+        # single pass over the common case of a flat dict of scalars
+        return {
+            (k if type(k) is str else jsonify(k)): (
+                v if type(v) in _JSON_PRIMITIVES else jsonify(v)
+            )
+            for k, v in value.items()
+        }
+    elif kind is list or kind is tuple:
+        return [v if type(v) in _JSON_PRIMITIVES else jsonify(v) for v in value]
+    elif isinstance(value, np.generic):
+        value = value.item()
+        return None if value != value else value
+    elif isinstance(value, str):
         return value
     elif isinstance(value, Path):
         return str(value)
@@ -33,7 +86,7 @@ def jsonify(value):
         except AttributeError:
             return value
     elif isinstance(value, np.ndarray):
-        return jsonify(value.tolist())
+        return _jsonify_array(value)
     elif isinstance(value, dict):
         return {jsonify(k): jsonify(v) for k, v in value.items()}
     else:
@@ -43,27 +96,263 @@ def jsonify(value):
             return value
 
 
+def _jsonify_array(array: np.ndarray):
+    """
+    Convert a numeric array in bulk, instead of visiting each element with :py:func:`jsonify`.
+    """
+    if array.dtype.kind in "biu":
+        return array.tolist()
+    if array.dtype.kind == "f":
+        nan = np.isnan(array)
+        if not nan.any():
+            return array.tolist()
+        array = array.astype(object)
+        array[nan] = None
+        return array.tolist()
+    return jsonify(array.tolist())
+
+
+def _jsonify_column(column) -> list:
+    if not isinstance(column, np.ndarray):
+        # numpy would coerce mixed types, e.g. [True, 2] to [1, 2] and [1, "a"] to ["1", "a"]
+        if len({type(value) for value in column}) != 1:
+            return [jsonify(value) for value in column]
+        column = np.asarray(column)
+    if column.dtype.kind in "biuf":
+        return _jsonify_array(column)
+    return [jsonify(value) for value in column]
+
+
+def _json_equal(a, b) -> bool:
+    # unlike ==, distinguishes e.g. 0 from False and 1 from 1.0, which differ once stored as JSON
+    if type(a) is not type(b):
+        return False
+    if type(a) is dict:
+        return a.keys() == b.keys() and all(_json_equal(a[k], b[k]) for k in a)
+    if type(a) is list:
+        return len(a) == len(b) and all(_json_equal(x, y) for x, y in zip(a, b))
+    return a == b
+
+
+def sweep_params(
+    graphql_endpoint: Optional[str],
+    random: np.random.Generator,
+    sweep_id: int,
+    data: dict,
+) -> Optional[dict]:
+    """
+    Resolve the response to :py:attr:`RunLogger.add_run_to_sweep_mutation` into parameters for a run.
+    If the sweep has a ``grid_index``, the parameters are the combination at that index in
+    :py:class:`ParamGrid <run_logger.params.ParamGrid>` (cycling once the grid is exhausted);
+    otherwise they are drawn with :py:func:`param_sampler <run_logger.params.param_sampler>`.
+    The sweep's parameter choices are cached in :py:data:`sweep_configs`, so later runs of the same sweep
+    in this process do not fetch them again.
+
+    :param graphql_endpoint: The endpoint of the Hasura GraphQL API, which (with ``sweep_id``) identifies the sweep.
+    :param random: The random number generator used to draw parameters.
+    :param sweep_id: The ID of the sweep.
+    :param data: The response to :py:attr:`RunLogger.add_run_to_sweep_mutation`
+        (or :py:attr:`RunLogger.add_run_to_cached_sweep_mutation`).
+    :return: The parameters, or ``None`` if the response does not describe the sweep.
+    """
+    key = (graphql_endpoint, sweep_id)
+    if key not in sweep_configs:
+        sweep = data["insert_run_one"].get("sweep")
+        if sweep is None:
+            return None
+        config = {d["Key"]: d["choice"] for d in sweep["parameter_choices"]}
+        sweep_configs[key] = config, ParamGrid(config)
+    config, grid = sweep_configs[key]
+    update_sweep_response = data.get("update_sweep")
+    if not update_sweep_response or not update_sweep_response["returning"]:
+        return None
+    [returning] = update_sweep_response["returning"]
+    if "grid_index" not in returning:
+        # the mutation did not claim a grid index (e.g. that of SweepLogger)
+        return None
+    grid_index = returning["grid_index"]
+    if grid_index is None or not grid.size:
+        return param_sampler(config, random)
+    # grid_index has already been incremented past the index claimed by this run
+    return grid[(grid_index - 1) % grid.size]
+
+
 @dataclass
 class Client:
+    """
+    A thin wrapper around the ``gql`` client. Clients that target the same endpoint
+    (with the same ``pool_size`` and ``compress_threshold``) share a pool of keep-alive connections.
+
+    :param graphql_endpoint: The endpoint of the Hasura GraphQL API.
+    :param timeout: Timeout (in seconds) for each HTTP request. A request that times out is retried
+        according to ``retry_policy``. If ``None``, requests never time out.
+    :param pool_size: Maximum number of connections kept open to ``graphql_endpoint``.
+    :param compress_threshold: Request bodies of at least this many bytes are gzip-compressed. If ``None``,
+        bodies are never compressed. Note that the server (or a proxy in front of it) must accept ``Content-Encoding: gzip``.
+    :param retry_policy: Determines which failures are retried, how often and how long to wait in between.
+    :param spill_dir: Directory in which mutations that fail after all retries are spilled (see :py:meth:`execute`).
+        If ``None``, such failures raise. Defaults to ``$RUN_LOGGER_SPILL_DIR`` or ``~/.cache/run-logger/spill``.
+    :param stats: If provided, every call to :py:meth:`execute` is recorded in it (see :py:class:`Stats <run_logger.stats.Stats>`).
+    """
+
     graphql_endpoint: str
+    timeout: Optional[float] = 30
+    pool_size: int = 10
+    compress_threshold: Optional[int] = None
+    retry_policy: RetryPolicy = field(default_factory=RetryPolicy)
+    spill_dir: Optional[Path] = field(default_factory=default_spill_dir)
+    stats: Optional[Stats] = field(default=None, repr=False)
 
     def __post_init__(self):
-        transport = RequestsHTTPTransport(url=self.graphql_endpoint)
+        self._after_fork()
+        fork.on_child(self._after_fork)
+
+    def _after_fork(self):
+        # also called in the child after a fork, which must not share the parent's
+        # connection state, lock (possibly held by another thread) or spill file
+        transport = PooledHTTPTransport(
+            url=self.graphql_endpoint,
+            timeout=self.timeout,
+            pool_size=self.pool_size,
+            compress_threshold=self.compress_threshold,
+        )
         self.client = GQLClient(transport=transport)
+        self._lock = threading.Lock()
+        self.spill_queue = None
+        self._replay_attempts = 0
+        self._next_replay_time = 0.0
+        if self.spill_dir is not None:
+            self.spill_queue = SpillQueue(
+                Path(self.spill_dir) / f"{os.getpid()}-{uuid.uuid4().hex}.jsonl"
+            )
+
+    def execute(self, query: DocumentNode, variable_values: dict, spill: bool = False):
+        """
+        Execute a query or mutation, retrying transient failures according to ``retry_policy``.
+
+        :param query: The parsed query or mutation.
+        :param variable_values: Variables for ``query``, converted with :py:func:`jsonify`.
+        :param spill: If ``True`` and a ``spill_dir`` is configured, a mutation that still fails after all
+            retries is appended to the spill queue (and ``None`` is returned) instead of raising. While
+            the spill queue is not empty, such mutations are spilled immediately, to preserve their order,
+            except that the queue is replayed first if it has not been tried for a while (with the backoff
+            of ``retry_policy``). Call :py:meth:`replay` to send them right away.
+        """
+        variable_values = jsonify(variable_values)
+        if self.stats is None:
+            return self._execute_or_spill(query, variable_values, spill)
+        retries = []
+        result = error = None
+        start = time.perf_counter()
+        try:
+            result = self._execute_or_spill(
+                query, variable_values, spill, on_retry=retries.append
+            )
+            return result
+        except Exception as e:
+            error = e
+            raise
+        finally:
+            self.stats.record(
+                ExecuteEvent(
+                    operation=operation_name(query) or "anonymous",
+                    seconds=time.perf_counter() - start,
+                    nbytes=len(json.dumps(variable_values)),
+                    rows=len(variable_values.get("objects", ())),
+                    retries=len(retries),
+                    spilled=error is None and result is None,
+                    error=error,
+                )
+            )
+
+    def _execute_or_spill(
+        self,
+        query: DocumentNode,
+        variable_values: dict,
+        spill: bool,
+        on_retry: Optional[Callable[[Exception], None]] = None,
+    ):
+        spill = spill and self.spill_queue is not None
+        if spill and len(self.spill_queue) and not self._try_replay():
+            self.spill_queue.append(query, variable_values)
+            return None
+        try:
+            return self._execute(query, variable_values, on_retry)
+        except Exception as e:
+            if not (spill and self.retry_policy.is_retryable(e)):
+                raise
+            logging.warning(f"Spilling mutation to {self.spill_queue.path}: {e!r}")
+            self.spill_queue.append(query, variable_values)
+            self._replay_attempts = 1
+            self._next_replay_time = time.monotonic() + self.retry_policy.backoff(1)
+            return None
+
+    def _try_replay(self) -> bool:
+        # Replay the spill queue (one attempt per mutation) unless the last attempt was too recent,
+        # so that mutations are sent again soon after an outage instead of being spilled until flush or close.
+        if time.monotonic() < self._next_replay_time:
+            return False
+        self.spill_queue.replay(
+            lambda query, variable_values: self._execute(
+                query, variable_values, max_attempts=1
+            ),
+            self.retry_policy.is_retryable,
+        )
+        if len(self.spill_queue):
+            self._replay_attempts += 1
+            self._next_replay_time = time.monotonic() + self.retry_policy.backoff(
+                self._replay_attempts
+            )
+            return False
+        self._replay_attempts = 0
+        return True
+
+    def close(self):
+        """
+        Does nothing, since connections are pooled per endpoint and shared with other clients
+        (see :py:func:`get_session <run_logger.transport.get_session>`). Called by :py:meth:`RunLogger.close`,
+        like the ``close`` of other clients, such as :py:class:`LocalClient <run_logger.wal.LocalClient>`.
+        """
+
+    def replay(self) -> int:
+        """
+        Send mutations from the spill queue, in order, stopping at the first failure.
+
+        :return: The number of mutations sent.
+        """
+        if self.spill_queue is None:
+            return 0
+        return self.spill_queue.replay(self._execute, self.retry_policy.is_retryable)
 
-    def execute(self, query: str, variable_values: dict):
-        sleep_time = 1
+    def _execute(
+        self,
+        query: DocumentNode,
+        variable_values: dict,
+        on_retry: Optional[Callable[[Exception], None]] = None,
+        max_attempts: Optional[int] = None,
+    ):
+        if max_attempts is None:
+            max_attempts = self.retry_policy.max_attempts
+        attempt = 0
         while True:
+            attempt += 1
             try:
-                # noinspection PyTypeChecker
-                return self.client.execute(
-                    query, variable_values=jsonify(variable_values)
-                )
+                # the gql client connects and releases its transport around every call,
+                # so concurrent calls (e.g. from a background flush) must be serialized
+                with self._lock:
+                    # noinspection PyTypeChecker
+                    return self.client.execute(query, variable_values=variable_values)
             except Exception as e:
-                print(e)
-                breakpoint()
+                if attempt >= max_attempts or not self.retry_policy.is_retryable(e):
+                    raise
+                if on_retry is not None:
+                    on_retry(e)
+                sleep_time = self.retry_policy.backoff(attempt)
+                logging.warning(
+                    f"{e!r} (attempt {attempt}/{max_attempts}), "
+                    f"retrying in {sleep_time:.1f}s"
+                )
                 time.sleep(sleep_time)
-                sleep_time *= 2
 
 
 @dataclass
@@ -81,14 +370,59 @@ class RunLogger:
         If your application expects to perform many log operations in rapid succession, debouncing
         collects the log data over the course of this time interval to perform a single large API call,
         instead of several small ones which might jam the server.
+        This is the default ``max_latency`` of ``log_policy`` and ``blob_policy``.
+    :param background:
+        If ``True``, :py:meth:`log` and :py:meth:`blob` only enqueue rows and a background thread
+        (started on first use) sends them in batches, along with metadata updates (see :py:meth:`update_metadata`).
+        Call :py:meth:`flush` to wait for pending rows and :py:meth:`close` (or exit the ``with`` block) when done logging.
+    :param max_batch_size:
+        The default ``max_rows`` of ``log_policy`` and ``blob_policy``.
+    :param log_policy:
+        Determines when buffered logs are sent and how they are split into API calls
+        (see :py:class:`FlushPolicy <run_logger.batching.FlushPolicy>`). Defaults to
+        ``max_batch_size`` rows, no byte limit and ``debounce_time`` latency.
+    :param blob_policy:
+        Like ``log_policy``, for blobs. Defaults to ``max_batch_size`` rows, 16 MiB and ``debounce_time`` latency.
+    :param max_queue_size:
+        In ``background`` mode, the maximum number of rows waiting to be sent.
+        :py:meth:`log` and :py:meth:`blob` block while the queue is full.
+    :param flush_on_exit:
+        If ``True``, :py:meth:`close` is called when the interpreter exits or the process receives
+        ``SIGTERM`` or ``SIGINT``, so that rows held back by debouncing or batching are not lost.
+    :param client:
+        A :py:class:`Client` to use instead of the default one, e.g. to configure timeouts,
+        connection pooling or compression, or a :py:class:`LocalClient <run_logger.wal.LocalClient>`
+        to log offline (in which case ``graphql_endpoint`` may be ``None``).
+    :param aggregation:
+        If provided, :py:meth:`log` (and :py:meth:`log_many`) condense rows as described by the
+        :py:class:`AggregationPolicy <run_logger.aggregate.AggregationPolicy>` (e.g. one row of per-key means
+        per window of steps) and only send the condensed rows.
+    :param stats:
+        If provided, API calls and buffer depths are recorded in it (see :py:class:`Stats <run_logger.stats.Stats>`).
+        Defaults to the ``stats`` of ``client``, if any.
+    :param metadata_interval:
+        If provided, :py:meth:`update_metadata` merges updates on the client and sends them at most once
+        every ``metadata_interval`` seconds (on the next call to :py:meth:`update_metadata` or :py:meth:`log`
+        after the interval has elapsed), and on :py:meth:`flush` and :py:meth:`close`.
+        Useful for progress fields such as ``step`` or ``eta`` that are updated far more often than they are read.
     """
 
-    graphql_endpoint: str
+    graphql_endpoint: Optional[str]
     seed: int = 0
     _run_id: Optional[int] = None
     debounce_time: int = 0
+    background: bool = False
+    max_batch_size: int = 1000
+    log_policy: Optional[FlushPolicy] = None
+    blob_policy: Optional[FlushPolicy] = None
+    max_queue_size: int = 10000
+    flush_on_exit: bool = True
+    client: Optional[Client] = field(default=None, repr=False)
+    aggregation: Optional[AggregationPolicy] = None
+    stats: Optional[Stats] = field(default=None, repr=False)
+    metadata_interval: Optional[float] = None
 
-    insert_new_run_mutation = gql(
+    insert_new_run_mutation = LazyDocument(
         """
     mutation insert_new_run($metadata: jsonb = {}, $charts: [chart_insert_input!] = []) {
       insert_run_one(object: {charts: {data: $charts}, metadata: $metadata}) {
@@ -97,7 +431,7 @@ class RunLogger:
     }
     """
     )
-    add_run_to_sweep_mutation = gql(
+    add_run_to_sweep_mutation = LazyDocument(
         """
     mutation add_run_to_sweep($metadata: jsonb = {}, $sweep_id: Int!, $charts: [chart_insert_input!] = []) {
         insert_run_one(object: {charts: {data: $charts}, metadata: $metadata, sweep_id: $sweep_id}) {
@@ -117,7 +451,21 @@ class RunLogger:
     }
     """
     )
-    update_metadata_mutation = gql(
+    add_run_to_cached_sweep_mutation = LazyDocument(
+        """
+    mutation add_run_to_cached_sweep($metadata: jsonb = {}, $sweep_id: Int!, $charts: [chart_insert_input!] = []) {
+        insert_run_one(object: {charts: {data: $charts}, metadata: $metadata, sweep_id: $sweep_id}) {
+            id
+        }
+        update_sweep(where: {id: {_eq: $sweep_id}}, _inc: {grid_index: 1}) {
+            returning {
+                grid_index
+            }
+        }
+    }
+    """
+    )
+    update_metadata_mutation = LazyDocument(
         """
     mutation update_metadata($metadata: jsonb!, $run_id: Int!) {
         update_run(
@@ -129,7 +477,7 @@ class RunLogger:
     }
     """
     )
-    insert_run_logs_mutation = gql(
+    insert_run_logs_mutation = LazyDocument(
         """
     mutation insert_run_logs($objects: [run_log_insert_input!]!) {
       insert_run_log(objects: $objects) {
@@ -138,7 +486,7 @@ class RunLogger:
     }
     """
     )
-    insert_run_blobs_mutation = gql(
+    insert_run_blobs_mutation = LazyDocument(
         """
     mutation insert_run_blobs($objects: [run_blob_insert_input!]!) {
       insert_run_blob(objects: $objects) {
@@ -150,18 +498,48 @@ class RunLogger:
 
     def __post_init__(self):
         self.random = np.random.default_rng(seed=self.seed)
-        assert self.graphql_endpoint is not None
-        self.client = Client(graphql_endpoint=self.graphql_endpoint)
-        self._log_buffer = []
-        self._blob_buffer = []
-        self._last_log_time = None
-        self._last_blob_time = None
+        assert (
+            self.graphql_endpoint is not None or self.client is not None
+        ), "RunLogger requires a graphql_endpoint or a client"
+        if self.client is None:
+            self.client = Client(
+                graphql_endpoint=self.graphql_endpoint, stats=self.stats
+            )
+        elif self.stats is None:
+            self.stats = getattr(self.client, "stats", None)
+        if self.log_policy is None:
+            self.log_policy = FlushPolicy(
+                max_rows=self.max_batch_size, max_latency=self.debounce_time
+            )
+        if self.blob_policy is None:
+            self.blob_policy = FlushPolicy(
+                max_rows=self.max_batch_size,
+                max_bytes=16 << 20,
+                max_latency=self.debounce_time,
+            )
+        self._log_buffer = Buffer(self.log_policy)
+        self._blob_buffer = Buffer(self.blob_policy)
+        self._rows_sent = 0
+        self._deferred_metadata = {}
+        # metadata as last sent, so that unchanged keys are not sent again
+        self._sent_metadata = {}
+        self._metadata_sent_at = time.monotonic()
+        self._aggregator = None
+        if self.aggregation is not None:
+            self._aggregator = Aggregator(self.aggregation)
+        self._flusher = None
+        self._flusher_lock = threading.Lock()
+        if self.stats is not None:
+            self.stats.add_gauges(self._buffer_depths)
+        fork.on_child(self._after_fork)
+        if self.flush_on_exit:
+            shutdown.register(self)
 
     def __enter__(self):
         return self
 
     def __exit__(self, exc_type, exc_val, exc_tb):
-        pass
+        self.close()
 
     @property
     def run_id(self):
@@ -172,9 +550,11 @@ class RunLogger:
         metadata: Optional[dict],
         charts: Optional[List[dict]] = None,
         sweep_id: Optional[int] = None,
-    ) -> None:
+    ) -> Optional[dict]:
         """
         Creates a new run in the Hasura database.
+        If the run is enrolled in a sweep, this also claims the sweep's next grid index
+        and resolves it into concrete parameters.
 
         :param metadata: Any useful data about the run being created, e.g. git commit, parameters used, etc. ``run-logger`` makes no assumptions about the content of ``metadata``, except that it is JSON-compatible (or convertible to JSON-compatible by :py:func:`jsonify <run_logger.hasura_logger.jsonify>`).
         :param charts: A list of `Vega <https://vega.github.io/>`_ or `Vega-Lite <https://vega.github.io/vega-lite/>`_ graphical specifications, to be displayed by `run-visualizer <https://github.com/run-tracker/run-visualizer>`_.
@@ -182,6 +562,36 @@ class RunLogger:
         :return: A dictionary of new parameter values assigned by sweep, if run is associated with one
         (otherwise `None`).
         """
+        mutation, variable_values = self.create_run_request(
+            metadata=metadata,
+            charts=charts,
+            sweep_id=sweep_id,
+            fetch_sweep=(self.graphql_endpoint, sweep_id) not in sweep_configs,
+        )
+        data = self.execute(mutation, variable_values=variable_values)
+        insert_run_response = data["insert_run_one"]
+        self._run_id = insert_run_response["id"]
+        self._sent_metadata = jsonify(dict(metadata or {}))
+        if sweep_id is not None:
+            return sweep_params(self.graphql_endpoint, self.random, sweep_id, data)
+
+    @classmethod
+    def create_run_request(
+        cls,
+        metadata: Optional[dict],
+        charts: Optional[List[dict]],
+        sweep_id: Optional[int],
+        fetch_sweep: bool = True,
+    ) -> Tuple[DocumentNode, dict]:
+        """
+        :param metadata: See :py:meth:`create_run`.
+        :param charts: See :py:meth:`create_run`.
+        :param sweep_id: See :py:meth:`create_run`.
+        :param fetch_sweep: Whether the mutation should also fetch the sweep's parameter choices
+            (which are unnecessary if they are already in :py:data:`sweep_configs`).
+        :return: The mutation that creates a run (and, if ``sweep_id`` is given, enrolls it in the sweep)
+            and its variables.
+        """
         variable_values = dict(metadata=metadata)
         if charts is not None:
             variable_values.update(
@@ -190,15 +600,16 @@ class RunLogger:
                 ]
             )
         if sweep_id is None:
-            mutation = self.insert_new_run_mutation
+            mutation = cls.insert_new_run_mutation
         else:
-            mutation = self.add_run_to_sweep_mutation
+            if fetch_sweep:
+                mutation = cls.add_run_to_sweep_mutation
+            else:
+                mutation = cls.add_run_to_cached_sweep_mutation
             variable_values.update(sweep_id=sweep_id)
-        data = self.execute(mutation, variable_values=variable_values)
-        insert_run_response = data["insert_run_one"]
-        self._run_id = insert_run_response["id"]
+        return mutation, variable_values
 
-    def update_metadata(self, metadata: dict):
+    def update_metadata(self, metadata: dict, defer: bool = False):
         """
         This will combine given metadata with existing run metadata
         using the Hasura
@@ -206,14 +617,53 @@ class RunLogger:
         operator.
 
         You must call :meth:`HasuraLogger.create_run` before calling this method.
+
+        Only keys whose values differ from those last sent (or inserted by :py:meth:`create_run`) are sent,
+        and nothing is sent if no key changed. See also ``metadata_interval``.
+
+        :param defer: If ``True``, the metadata is not sent right away but merged into a single update
+            sent by the next :py:meth:`flush` (or :py:meth:`close`).
         """
         assert self.run_id is not None, "add_metadata called before create_run"
+        for key, value in jsonify(metadata).items():
+            if key in self._sent_metadata and _json_equal(
+                self._sent_metadata[key], value
+            ):
+                # e.g. changed and changed back since the last update
+                self._deferred_metadata.pop(key, None)
+            else:
+                self._deferred_metadata[key] = value
+        if defer:
+            return
+        if (
+            self.metadata_interval is None
+            or time.monotonic() - self._metadata_sent_at >= self.metadata_interval
+        ):
+            self._send_metadata()
+
+    def _send_metadata(self):
+        metadata, self._deferred_metadata = self._deferred_metadata, {}
+        self._metadata_sent_at = time.monotonic()
+        if not metadata:
+            return
+        if self.background and (self._flusher is None or not self._flusher.closed):
+            # keep the mutation off the caller's thread, like logs and blobs
+            self._put("metadata", metadata)
+        else:
+            self._update_metadata([metadata])
+        self._sent_metadata.update(metadata)
+
+    def _update_metadata(self, updates: List[dict]):
+        metadata = {}
+        for update in updates:
+            metadata.update(update)
         self.execute(
             self.update_metadata_mutation,
             variable_values=dict(
                 metadata=metadata,
                 run_id=self.run_id,
             ),
+            spill=True,
         )
 
     def log(self, **log):
@@ -226,18 +676,80 @@ class RunLogger:
         You must call :meth:`HasuraLogger.create_run` before calling this method.
         """
         assert self.run_id is not None, "log called before create_run"
-
-        self._log_buffer.append(dict(log=log, run_id=self.run_id))
+        if self._aggregator is None:
+            self._log(log)
+        else:
+            for aggregated in self._aggregator.add(log):
+                self._log(aggregated)
         if (
-            self._last_log_time is None
-            or time.time() - self._last_log_time > self.debounce_time
+            self._deferred_metadata
+            and self.metadata_interval is not None
+            and time.monotonic() - self._metadata_sent_at >= self.metadata_interval
         ):
-            self.execute(
-                self.insert_run_logs_mutation,
-                variable_values=dict(objects=self._log_buffer),
-            )
-            self._last_log_time = time.time()
-            self._log_buffer = []
+            self._send_metadata()
+
+    def _log(self, log: dict):
+        row = dict(log=log, run_id=self.run_id)
+        if self.background:
+            self._put("log", row)
+            return
+        if self._log_buffer.append(row) or self._log_buffer.stale():
+            self._flush_logs()
+
+    def log_many(self, logs: Iterable[dict]):
+        """
+        Log many rows at once. Equivalent to calling :py:meth:`log` once per row, but rows are sent
+        immediately (regardless of ``debounce_time``), split into API calls according to ``log_policy``.
+
+        You must call :meth:`HasuraLogger.create_run` before calling this method.
+
+        :param logs: An iterable of dictionaries, one per row.
+        """
+        assert self.run_id is not None, "log_many called before create_run"
+        if self._aggregator is not None:
+            logs = [
+                aggregated for log in logs for aggregated in self._aggregator.add(log)
+            ]
+        rows = [dict(log=log, run_id=self.run_id) for log in logs]
+        if self.background:
+            for row in rows:
+                self._put("log", row)
+            return
+        # preserve ordering with respect to rows held back by debouncing
+        self._flush_logs()
+        for batch in split(rows, self.log_policy):
+            self._insert("log", batch)
+
+    def log_arrays(
+        self,
+        arrays: Union[Mapping[str, np.ndarray], np.ndarray, None] = None,
+        **columns,
+    ):
+        """
+        Log columnar data, e.g. a whole epoch of per-step metrics. Row ``i`` of the logs
+        contains element ``i`` of every column, so that::
+
+            logger.log_arrays(step=np.arange(3), loss=loss)
+
+        is equivalent to calling ``logger.log(step=i, loss=loss[i])`` for ``i`` in ``range(3)``.
+        Columns are converted to JSON in bulk (see :py:func:`jsonify`) and sent as in :py:meth:`log_many`.
+
+        :param arrays: A dictionary of equal-length arrays or a structured (record) array, whose fields are used as columns.
+        :param columns: Additional columns, given as keyword arguments.
+        """
+        if arrays is None:
+            arrays = {}
+        elif isinstance(arrays, np.ndarray):
+            if arrays.dtype.names is None:
+                raise ValueError("log_arrays expects a structured array")
+            arrays = {name: arrays[name] for name in arrays.dtype.names}
+        columns = {**arrays, **columns}
+        lengths = {key: len(column) for key, column in columns.items()}
+        if len(set(lengths.values())) > 1:
+            raise ValueError(f"log_arrays expects equal-length columns, got {lengths}")
+        keys = list(columns)
+        values = [_jsonify_column(column) for column in columns.values()]
+        self.log_many(dict(zip(keys, row)) for row in zip(*values))
 
     def blob(self, blob: str, metadata: dict):
         """
@@ -253,17 +765,159 @@ class RunLogger:
         """
         assert self.run_id is not None, "blob called before create_run"
 
-        self._blob_buffer.append(dict(blob=blob, metadata=metadata, run_id=self.run_id))
-        if (
-            self._last_blob_time is None
-            or time.time() - self._last_blob_time > self.debounce_time
+        row = dict(blob=blob, metadata=metadata, run_id=self.run_id)
+        if self.background:
+            self._put("blob", row)
+            return
+        if self._blob_buffer.append(row) or self._blob_buffer.stale():
+            self._flush_blobs()
+
+    def stream_blob(
+        self,
+        source: BlobSource,
+        metadata: dict,
+        chunk_size: int = 4 << 20,
+        compression: Optional[str] = "gzip",
+    ) -> str:
+        """
+        Store a large blob (e.g. an image, checkpoint or video) without holding it in memory.
+        The data is read incrementally, compressed, split into chunks of ``chunk_size`` bytes and inserted
+        one chunk per API call, followed by a manifest (see :py:func:`blob_rows <run_logger.blobs.blob_rows>`).
+        Read it back with :py:func:`read_blob <run_logger.blobs.read_blob>`.
+
+        You must call :py:func:`create_run <run_logger.hasura_logger.create_run>` before calling this method.
+
+        :param source: ``bytes``, a ``bytearray`` or ``memoryview``, a file path, a binary file object or an iterable of ``bytes``.
+        :param metadata: any JSON-compatible metadata to be stored with the blob's manifest.
+        :param chunk_size: Maximum number of (compressed) bytes per chunk.
+        :param compression: ``"gzip"``, ``"zstd"`` (requires the ``zstandard`` package) or ``None``.
+        :return: The blob ID, which identifies the blob's chunks and manifest.
+        """
+        assert self.run_id is not None, "stream_blob called before create_run"
+        for row in blob_rows(
+            source,
+            metadata=metadata,
+            run_id=self.run_id,
+            chunk_size=chunk_size,
+            compression=compression,
         ):
-            self.execute(
-                self.insert_run_blobs_mutation,
-                variable_values=dict(objects=self._blob_buffer),
+            self._insert("blob", [row])
+        return row["metadata"]["blob_id"]
+
+    def flush(self):
+        """
+        Send all buffered logs and blobs, including those held back by debouncing.
+        In ``background`` mode, blocks until the background thread has sent every row
+        enqueued before this call. Also sends metadata deferred by :py:meth:`update_metadata`.
+        Finally, replays mutations spilled by the client during an outage (see :py:meth:`Client.execute`).
+        """
+        if self._deferred_metadata:
+            self._send_metadata()
+        if self._flusher is not None:
+            self._flusher.flush()
+        else:
+            self._flush_logs()
+            self._flush_blobs()
+        self.client.replay()
+
+    def close(self) -> int:
+        """
+        Send all buffered logs and blobs, stop the background thread (if any) and close the client
+        (e.g. the files of a :py:class:`LocalClient <run_logger.wal.LocalClient>`).
+        This is called automatically on exiting a ``with`` block and, if ``flush_on_exit``
+        is set, at interpreter exit and on ``SIGTERM``/``SIGINT``. Calling it more than once is safe.
+
+        :return: The number of rows sent while closing.
+        """
+        start = time.time()
+        rows_sent = self._rows_sent
+        if self._aggregator is not None:
+            for aggregated in self._aggregator.drain():
+                self._log(aggregated)
+        if self._deferred_metadata:
+            self._send_metadata()
+        if self._flusher is not None:
+            self._flusher.close()
+        self.flush()
+        self.client.close()
+        rows_sent = self._rows_sent - rows_sent
+        if rows_sent:
+            logging.info(
+                f"Flushed {rows_sent} rows for run {self.run_id} in {time.time() - start:.3f}s"
             )
-            self._last_blob_time = time.time()
-            self._blob_buffer = []
+        return rows_sent
+
+    def _put(self, kind: str, row: dict):
+        # the thread is started on first use, e.g. not in every forked worker of a DataLoader
+        if self._flusher is None:
+            with self._flusher_lock:
+                if self._flusher is None:
+                    self._flusher = self._start_flusher()
+        self._flusher.put(kind, row)
+
+    def _start_flusher(self) -> BackgroundFlusher:
+        return BackgroundFlusher(
+            send=self._send,
+            policies=dict(
+                log=self.log_policy,
+                blob=self.blob_policy,
+                # updates are merged into one mutation per batch
+                metadata=FlushPolicy(max_latency=0),
+            ),
+            max_queue_size=self.max_queue_size,
+        )
+
+    def _after_fork(self):
+        # Rows buffered before the fork are sent by the parent: drop the child's copies,
+        # and give the child its own random numbers. The parent's background thread does not
+        # exist in the child, which starts its own if it logs.
+        self._log_buffer = Buffer(self.log_policy)
+        self._blob_buffer = Buffer(self.blob_policy)
+        self._deferred_metadata = {}
+        if self._aggregator is not None:
+            self._aggregator = Aggregator(self.aggregation)
+        self._flusher = None
+        self._flusher_lock = threading.Lock()
+        self.random = np.random.default_rng([self.seed, os.getpid()])
+
+    def handle(self) -> "RunHandle":
+        """
+        :return: A picklable :py:class:`RunHandle <run_logger.handle.RunHandle>` for this run,
+            e.g. to log from worker processes.
+        """
+        from run_logger.handle import RunHandle
+
+        return RunHandle.of(self)
+
+    def _buffer_depths(self) -> Dict[str, int]:
+        depths = dict(
+            log_buffer=len(self._log_buffer), blob_buffer=len(self._blob_buffer)
+        )
+        if self._flusher is not None:
+            depths.update(queue=self._flusher.queue.qsize())
+        return depths
+
+    def _flush_logs(self):
+        for batch in self._log_buffer.drain():
+            self._insert("log", batch)
+
+    def _flush_blobs(self):
+        for batch in self._blob_buffer.drain():
+            self._insert("blob", batch)
+
+    def _send(self, kind: str, rows: List[dict]):
+        if kind == "metadata":
+            self._update_metadata(rows)
+        else:
+            self._insert(kind, rows)
+
+    def _insert(self, kind: str, objects: List[dict]):
+        mutation = {
+            "log": self.insert_run_logs_mutation,
+            "blob": self.insert_run_blobs_mutation,
+        }[kind]
+        self.execute(mutation, variable_values=dict(objects=objects), spill=True)
+        self._rows_sent += len(objects)
 
     def execute(self, *args, **kwargs):
         return self.client.execute(*args, **kwargs)
@@ -0,0 +1,73 @@
+import atexit
+import logging
+import signal
+import threading
+import weakref
+
+from run_logger import fork
+
+# keyed by id because dataclass loggers are unhashable
+_loggers = weakref.WeakValueDictionary()
+_previous_handlers = {}
+_lock = threading.Lock()
+_installed = False
+
+
+def _after_fork_in_child():
+    global _lock
+    _lock = threading.Lock()
+
+
+fork.on_child(_after_fork_in_child)
+
+
+def register(logger) -> None:
+    """
+    Ensure that ``logger.close()`` is called when the interpreter exits, including when the process
+    receives ``SIGTERM`` or ``SIGINT``: these raise ``SystemExit`` and ``KeyboardInterrupt`` respectively,
+    so that the stack unwinds (releasing any locks held by the interrupted code) before the loggers are closed.
+
+    :param logger: Any object with a ``close`` method, typically a :py:class:`RunLogger <run_logger.run.RunLogger>`.
+    """
+    global _installed
+    with _lock:
+        _loggers[id(logger)] = logger
+        if _installed:
+            return
+        _installed = True
+    atexit.register(close_all)
+    for signum in (signal.SIGTERM, signal.SIGINT):
+        try:
+            _previous_handlers[signum] = signal.signal(signum, _handle_signal)
+        except ValueError:
+            # signal handlers can only be installed from the main thread
+            logging.debug(f"Unable to install handler for {signum!r}")
+
+
+def close_all() -> None:
+    """
+    Close every registered logger, flushing whatever they still buffer.
+    """
+    for logger in list(_loggers.values()):
+        try:
+            logger.close()
+        except Exception:
+            logging.exception(f"Failed to close {logger!r}")
+
+
+def _handle_signal(signum, frame):
+    # Closing the loggers here could deadlock: the interrupted code may hold a lock that close() needs
+    # (e.g. the client's lock around an HTTP call, or a queue's mutex). Instead, unwind the stack
+    # and let the atexit hook close them.
+    previous = _previous_handlers.get(signum)
+    if previous is None:
+        # a handler installed from C, which cannot be called from Python
+        previous = signal.SIG_DFL
+    if callable(previous):
+        previous(
+            signum, frame
+        )  # e.g. the default SIGINT handler, which raises KeyboardInterrupt
+    elif previous == signal.SIG_DFL:
+        if signum == signal.SIGINT:
+            signal.default_int_handler(signum, frame)
+        raise SystemExit(128 + signum)
@@ -0,0 +1,156 @@
+import logging
+import threading
+import weakref
+from bisect import bisect_left
+from dataclasses import dataclass, field
+from typing import Callable, Dict, List, Optional
+
+# upper bounds (in seconds) of the latency histogram buckets: 0.5ms, 1ms, 2ms, ..., ~33s
+LATENCY_BUCKETS = [0.0005 * 2**i for i in range(17)]
+
+
+@dataclass
+class ExecuteEvent:
+    """
+    Passed to the hooks of :py:class:`Stats` after every call to
+    :py:meth:`Client.execute <run_logger.run.Client.execute>`.
+
+    :param operation: The name of the query or mutation, e.g. ``"insert_run_logs"``.
+    :param seconds: Wall time of the call, including retries.
+    :param nbytes: Size of the serialized variables.
+    :param rows: Number of rows inserted (the length of the ``objects`` variable), if any.
+    :param retries: Number of failed attempts that were retried.
+    :param spilled: Whether the mutation was spilled instead of sent.
+    :param error: The exception raised by the call, if any.
+    """
+
+    operation: str
+    seconds: float
+    nbytes: int
+    rows: int
+    retries: int
+    spilled: bool
+    error: Optional[BaseException]
+
+
+@dataclass
+class OperationStats:
+    """
+    Totals for one kind of query or mutation. ``latency`` counts calls per bucket of :py:data:`LATENCY_BUCKETS`,
+    plus a last bucket for slower calls.
+    """
+
+    calls: int = 0
+    errors: int = 0
+    retries: int = 0
+    spilled: int = 0
+    rows: int = 0
+    bytes: int = 0
+    seconds: float = 0
+    max_seconds: float = 0
+    latency: List[int] = field(default_factory=lambda: [0] * (len(LATENCY_BUCKETS) + 1))
+
+    def quantile(self, q: float) -> Optional[float]:
+        """
+        :return: An upper bound of the ``q``-quantile of latency (in seconds), from the histogram.
+        """
+        if not self.calls:
+            return None
+        rank = q * self.calls
+        count = 0
+        for bound, n in zip(LATENCY_BUCKETS, self.latency):
+            count += n
+            if count >= rank:
+                return min(bound, self.max_seconds)
+        return self.max_seconds
+
+
+class Stats:
+    """
+    In-process instrumentation of a :py:class:`Client <run_logger.run.Client>` (and the
+    :py:class:`RunLogger <run_logger.run.RunLogger>` objects using it): per-operation call counts,
+    latency histograms, serialized bytes, rows, retries and spills, plus the current depth of each logger's buffers.
+    Pass one as ``stats`` to enable instrumentation (without it, the only cost is an ``is None`` check per call)::
+
+        stats = Stats()
+        logger = RunLogger(graphql_endpoint, stats=stats)
+        ...
+        print(stats.snapshot())
+
+    :param hooks: Called with an :py:class:`ExecuteEvent` after every call, e.g. to export metrics.
+        Hooks run on the calling thread (which is the background thread in ``background`` mode).
+        Exceptions raised by hooks are logged and otherwise ignored.
+    """
+
+    def __init__(self, hooks: Optional[List[Callable[[ExecuteEvent], None]]] = None):
+        self.hooks = list(hooks or [])
+        self.operations: Dict[str, OperationStats] = {}
+        self._gauges: List[weakref.WeakMethod] = []
+        self._lock = threading.Lock()
+
+    def record(self, event: ExecuteEvent):
+        with self._lock:
+            stats = self.operations.get(event.operation)
+            if stats is None:
+                stats = self.operations[event.operation] = OperationStats()
+            stats.calls += 1
+            stats.errors += event.error is not None
+            stats.retries += event.retries
+            stats.spilled += event.spilled
+            stats.rows += event.rows
+            stats.bytes += event.nbytes
+            stats.seconds += event.seconds
+            stats.max_seconds = max(stats.max_seconds, event.seconds)
+            stats.latency[bisect_left(LATENCY_BUCKETS, event.seconds)] += 1
+        for hook in self.hooks:
+            # a failing hook must not fail (or mask the error of) the call it describes
+            try:
+                hook(event)
+            except Exception:
+                logging.exception(f"Stats hook {hook!r} failed")
+
+    def add_gauges(self, method: Callable[[], Dict[str, int]]):
+        """
+        Register a bound method returning current values (e.g. buffer depths), which :py:meth:`snapshot`
+        sums across all registered methods. Only a weak reference is kept, so loggers can be garbage-collected.
+        """
+        with self._lock:
+            self._gauges.append(weakref.WeakMethod(method))
+
+    def gauges(self) -> Dict[str, int]:
+        totals: Dict[str, int] = {}
+        with self._lock:
+            self._gauges = [ref for ref in self._gauges if ref() is not None]
+            methods = [ref() for ref in self._gauges]
+        for method in methods:
+            if method is not None:
+                for key, value in method().items():
+                    totals[key] = totals.get(key, 0) + value
+        return totals
+
+    def snapshot(self) -> dict:
+        """
+        :return: A JSON-compatible summary of everything recorded so far.
+        """
+        with self._lock:
+            operations = {
+                name: dict(
+                    calls=s.calls,
+                    errors=s.errors,
+                    retries=s.retries,
+                    spilled=s.spilled,
+                    rows=s.rows,
+                    bytes=s.bytes,
+                    seconds=s.seconds,
+                    mean_seconds=s.seconds / s.calls,
+                    p50_seconds=s.quantile(0.5),
+                    p99_seconds=s.quantile(0.99),
+                    max_seconds=s.max_seconds,
+                )
+                for name, s in self.operations.items()
+            }
+        return dict(operations=operations, gauges=self.gauges())
+
+    def reset(self):
+        with self._lock:
+            self.operations.clear()
@@ -1,21 +1,36 @@
 import argparse
 import copy
+import heapq
 import logging
-import math
 import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
 from dataclasses import dataclass
 from pathlib import Path
 from pprint import pformat
-from typing import Optional
+from typing import Any, Dict, List, Optional, Sequence, Tuple
 
-from gql import gql
+from run_logger.aggregate import Reduction
+from run_logger.cache import MISSING, ParamsCache
+from run_logger.documents import LazyDocument
+from run_logger.main import read_logs
+from run_logger.params import ParamGrid, param_sampler
+from run_logger.run import Client, RunLogger, sweep_configs
 
-from run_logger.run import RunLogger
+SUMMARIES = ("final", "min", "max", "mean")
+
+# per-run metric summaries, validated against the ID of each run's last log, so they never expire
+_cache_dir = os.getenv("RUN_LOGGER_CACHE_DIR")
+metrics_cache = ParamsCache(
+    maxsize=65536,
+    ttl=None,
+    directory=None if _cache_dir is None else Path(_cache_dir, "metrics"),
+)
 
 
 @dataclass
 class SweepLogger(RunLogger):
-    insert_new_sweep_mutation = gql(
+    insert_new_sweep_mutation = LazyDocument(
         """
 mutation insert_new_sweep(
     $metadata: jsonb,
@@ -29,7 +44,7 @@ mutation insert_new_sweep(
 }
     """
     )
-    add_run_to_sweep_mutation = gql(
+    add_run_to_sweep_mutation = LazyDocument(
         """
 mutation add_run_to_sweep($metadata: jsonb = {}, $sweep_id: Int!, $charts: [chart_insert_input!] = []) {
     insert_run_one(object: {charts: {data: $charts}, metadata: $metadata, sweep_id: $sweep_id}) {
@@ -43,6 +58,77 @@ mutation add_run_to_sweep($metadata: jsonb = {}, $sweep_id: Int!, $charts: [char
 }
     """
     )
+    # used instead of add_run_to_sweep_mutation once the sweep's parameter choices are cached
+    # (e.g. by register_runs); like it, it does not claim a grid index
+    add_run_to_cached_sweep_mutation = LazyDocument(
+        """
+mutation add_run_to_cached_sweep($metadata: jsonb = {}, $sweep_id: Int!, $charts: [chart_insert_input!] = []) {
+    insert_run_one(object: {charts: {data: $charts}, metadata: $metadata, sweep_id: $sweep_id}) {
+        id
+    }
+    update_sweep(where: {id: {_eq: $sweep_id}}) {
+        returning {
+            id
+        }
+    }
+}
+    """
+    )
+    insert_new_sweeps_mutation = LazyDocument(
+        """
+mutation insert_new_sweeps($objects: [sweep_insert_input!]!) {
+  insert_sweep(objects: $objects) {
+    returning {
+      id
+    }
+  }
+}
+    """
+    )
+    claim_grid_indices_mutation = LazyDocument(
+        """
+mutation claim_grid_indices($sweep_id: Int!, $count: Int!) {
+    update_sweep(where: {id: {_eq: $sweep_id}}, _inc: {grid_index: $count}) {
+        returning {
+            grid_index
+            parameter_choices {
+                Key
+                choice
+            }
+        }
+    }
+}
+    """
+    )
+    insert_new_runs_mutation = LazyDocument(
+        """
+mutation insert_new_runs($objects: [run_insert_input!]!) {
+  insert_run(objects: $objects) {
+    returning {
+      id
+    }
+  }
+}
+    """
+    )
+
+    list_sweep_runs_query = LazyDocument(
+        """
+query list_sweep_runs($sweep_id: Int!) {
+  run(where: {sweep_id: {_eq: $sweep_id}}, order_by: {id: asc}) {
+    id
+    metadata(path: "parameters")
+    run_logs_aggregate {
+      aggregate {
+        max {
+          id
+        }
+      }
+    }
+  }
+}
+    """
+    )
 
     def create_sweep(
         self,
@@ -57,13 +143,203 @@ mutation add_run_to_sweep($metadata: jsonb = {}, $sweep_id: Int!, $charts: [char
         sweep_id = response["insert_sweep_one"]["id"]
         return sweep_id
 
+    def create_sweeps(self, metadata: List[dict]) -> List[int]:
+        """
+        Create many sweeps in a single API call.
+
+        :param metadata: The metadata of each sweep.
+        :return: The ID of each sweep, in the same order as ``metadata``.
+        """
+        response = self.execute(
+            self.insert_new_sweeps_mutation,
+            variable_values=dict(objects=[dict(metadata=m) for m in metadata]),
+        )
+        return [sweep["id"] for sweep in response["insert_sweep"]["returning"]]
+
+    def register_runs(
+        self,
+        sweep_id: int,
+        count: int,
+        metadata: Optional[dict] = None,
+        charts: Optional[List[dict]] = None,
+    ) -> List[Tuple[int, Optional[dict]]]:
+        """
+        Create ``count`` runs enrolled in a sweep, e.g. before handing them to workers, in two API calls:
+        one atomically claims ``count`` consecutive grid indices of the sweep, the other inserts the runs
+        with their parameters in their metadata. Parameters are resolved as in
+        :py:meth:`create_run <run_logger.run.RunLogger.create_run>`. A worker can then log to its run with
+        ``RunLogger(graphql_endpoint, _run_id=run_id)``.
+
+        :param sweep_id: The ID of the sweep.
+        :param count: The number of runs to create.
+        :param metadata: Metadata shared by all the runs (each run also gets its own ``parameters``).
+        :param charts: Charts added to each run.
+        :return: The ID and parameters of each run.
+        """
+        [sweep] = self.execute(
+            self.claim_grid_indices_mutation,
+            variable_values=dict(sweep_id=sweep_id, count=count),
+        )["update_sweep"]["returning"]
+        config = {d["Key"]: d["choice"] for d in sweep["parameter_choices"]}
+        grid = ParamGrid(config)
+        sweep_configs[self.graphql_endpoint, sweep_id] = config, grid
+        grid_index = sweep["grid_index"]
+        if grid_index is None or not grid.size:
+            params = [param_sampler(config, self.random) for _ in range(count)]
+        else:
+            # grid_index has already been incremented past the indices claimed by these runs
+            params = [
+                grid[i % grid.size] for i in range(grid_index - count, grid_index)
+            ]
+        charts = [
+            dict(spec=spec, order=order) for order, spec in enumerate(charts or [])
+        ]
+        objects = [
+            dict(
+                charts=dict(data=charts),
+                metadata=dict(metadata or {}, parameters=p),
+                sweep_id=sweep_id,
+            )
+            for p in params
+        ]
+        runs = self.execute(
+            self.insert_new_runs_mutation, variable_values=dict(objects=objects)
+        )["insert_run"]["returning"]
+        return [(run["id"], p) for run, p in zip(runs, params)]
+
+    def summarize_sweep(
+        self,
+        sweep_id: int,
+        metrics: Sequence[str],
+        max_workers: int = 8,
+        page_size: int = 10000,
+        cache: Optional[ParamsCache] = metrics_cache,
+    ) -> List[Dict[str, Any]]:
+        """
+        Summarize the metrics logged by every run of a sweep, e.g. to pick its best configuration with :py:func:`top_k`.
+
+        A single query lists the runs with their parameters and (aggregated by Hasura) the ID of their last log.
+        Runs with logs that are not in ``cache`` are then read concurrently, projecting only ``metrics``
+        (see :py:func:`read_logs <run_logger.main.read_logs>`). Cached runs with new logs only read the new rows,
+        so re-analyzing a sweep while it runs is incremental.
+
+        :param sweep_id: The ID of the sweep.
+        :param metrics: The keys of the logs to summarize.
+        :param max_workers: The maximum number of runs read at the same time (each with its own connection).
+        :param page_size: The maximum number of rows fetched per query.
+        :param cache: Where summaries are kept between calls. The default cache keeps entries in memory and,
+            if the ``RUN_LOGGER_CACHE_DIR`` environment variable is set, on disk in its ``metrics`` subdirectory.
+            If ``None``, all logs are read on every call.
+        :return: One row per run, in order of ID, holding its ``run_id``, its ``parameters`` (a dictionary, so that
+            parameter names cannot collide with other columns), and ``f"{metric}_{summary}"`` for each metric
+            and each of :py:data:`SUMMARIES` (``None`` if never logged).
+        """
+        metrics = list(dict.fromkeys(metrics))
+        runs = self.execute(
+            self.list_sweep_runs_query, variable_values=dict(sweep_id=sweep_id)
+        )["run"]
+        use_cache = cache is not None and self.graphql_endpoint is not None
+        summaries: Dict[int, dict] = {}
+        stale = []
+        for run in runs:
+            last_id = run["run_logs_aggregate"]["aggregate"]["max"]["id"] or 0
+            summary = MISSING
+            if use_cache:
+                summary = cache.get(self.graphql_endpoint, run["id"])
+            if summary is MISSING or not set(metrics) <= set(summary["metrics"]):
+                summary = dict(metrics=metrics, last_id=0, reductions={})
+            summaries[run["id"]] = summary
+            if summary["last_id"] < last_id:
+                stale.append(run["id"])
+
+        local = threading.local()
+
+        def update(run_id: int) -> Tuple[int, dict]:
+            client = self
+            if isinstance(self.client, Client):
+                # a Client serializes its calls, so each thread gets its own (sharing the connection pool)
+                client = getattr(local, "client", None)
+                if client is None:
+                    client = local.client = Client(
+                        graphql_endpoint=self.client.graphql_endpoint,
+                        timeout=self.client.timeout,
+                        pool_size=self.client.pool_size,
+                        compress_threshold=self.client.compress_threshold,
+                        retry_policy=self.client.retry_policy,
+                        spill_dir=None,
+                    )
+            return run_id, _update_summary(summaries[run_id], run_id, client, page_size)
+
+        workers = max_workers if isinstance(self.client, Client) else 1
+        with ThreadPoolExecutor(max_workers=max(workers, 1)) as executor:
+            for run_id, summary in executor.map(update, stale):
+                summaries[run_id] = summary
+                if use_cache:
+                    cache.put(self.graphql_endpoint, run_id, summary)
+
+        table = []
+        for run in runs:
+            reductions = summaries[run["id"]]["reductions"]
+            row = dict(run_id=run["id"], parameters=run["metadata"] or {})
+            for metric in metrics:
+                reduction = reductions.get(metric)
+                for name in SUMMARIES:
+                    value = None
+                    if reduction is not None:
+                        value = Reduction.from_dict(reduction).result(
+                            "last" if name == "final" else name
+                        )
+                    row[f"{metric}_{name}"] = value
+            table.append(row)
+        return table
+
+
+def _update_summary(summary: dict, run_id: int, client, page_size: int) -> dict:
+    # returns a new summary (the cached one may be shared with other threads)
+    reductions = {
+        key: Reduction.from_dict(state) for key, state in summary["reductions"].items()
+    }
+    last_id = summary["last_id"]
+    metrics = summary["metrics"]
+    for page in read_logs(
+        run_id, client, keys=metrics, after_id=last_id, page_size=page_size
+    ):
+        last_id = page.last_id
+        for metric in metrics:
+            column = page.columns[metric]
+            for value in column.tolist():
+                if value is None or value != value:  # missing (None or nan)
+                    continue
+                reduction = reductions.get(metric)
+                if reduction is None:
+                    reduction = reductions[metric] = Reduction()
+                reduction.add(value)
+    return dict(
+        metrics=metrics,
+        last_id=last_id,
+        reductions={key: reduction.to_dict() for key, reduction in reductions.items()},
+    )
+
+
+def top_k(
+    table: List[Dict[str, Any]], key: str, k: int = 1, largest: bool = False
+) -> List[Dict[str, Any]]:
+    """
+    Select the best rows of a table returned by :py:meth:`SweepLogger.summarize_sweep`, e.g.
+    ``top_k(table, "loss_final", k=5)``. Rows where ``key`` is ``None`` are ignored.
+
+    :param key: The column to rank by.
+    :param k: The number of rows to return.
+    :param largest: If ``True``, the rows with the largest values are selected instead of the smallest.
+    :return: The selected rows, best first.
+    """
+    rows = [row for row in table if row.get(key) is not None]
+    select = heapq.nlargest if largest else heapq.nsmallest
+    return select(k, rows, key=lambda row: row[key])
+
 
 def compute_remaining_runs(params):
-    if isinstance(params, list):
-        return sum(compute_remaining_runs(param) for param in params)
-    if isinstance(params, dict):
-        return math.prod(map(compute_remaining_runs, params.values()))
-    return 1
+    return ParamGrid(params).size
 
 
 def create_sweep(
@@ -0,0 +1,114 @@
+import gzip
+import threading
+from typing import Dict, Optional, Tuple
+
+import requests
+from gql.transport.exceptions import TransportAlreadyConnected
+from gql.transport.requests import RequestsHTTPTransport
+from requests.adapters import HTTPAdapter
+
+from run_logger import fork
+
+_sessions: Dict[Tuple[str, int, Optional[int]], requests.Session] = {}
+_sessions_lock = threading.Lock()
+
+
+def _after_fork_in_child():
+    global _sessions_lock
+    # connections in the parent's sessions must not be shared with the child
+    _sessions.clear()
+    _sessions_lock = threading.Lock()
+
+
+fork.on_child(_after_fork_in_child)
+
+
+class CompressingAdapter(HTTPAdapter):
+    """
+    An ``HTTPAdapter`` that gzip-compresses request bodies of at least ``compress_threshold`` bytes.
+
+    :param compress_threshold: Minimum body size (in bytes) to compress. If ``None``, bodies are never compressed.
+    :param kwargs: Passed to ``HTTPAdapter`` (e.g. ``pool_maxsize``).
+    """
+
+    def __init__(self, compress_threshold: Optional[int] = None, **kwargs):
+        self.compress_threshold = compress_threshold
+        super().__init__(**kwargs)
+
+    def send(self, request, **kwargs):
+        body = request.body
+        if (
+            self.compress_threshold is not None
+            and body is not None
+            and len(body) >= self.compress_threshold
+        ):
+            if isinstance(body, str):
+                body = body.encode()
+            request.body = gzip.compress(body, compresslevel=1)
+            request.headers["Content-Encoding"] = "gzip"
+            request.headers["Content-Length"] = str(len(request.body))
+        return super().send(request, **kwargs)
+
+
+def get_session(
+    url: str, pool_size: int = 10, compress_threshold: Optional[int] = None
+) -> requests.Session:
+    """
+    Return a ``requests.Session`` shared by every transport in this process that targets ``url``
+    with the same settings, so that connections are kept alive and reused across requests and
+    logger instances.
+
+    :param url: The GraphQL endpoint.
+    :param pool_size: Maximum number of connections kept open to ``url``.
+    :param compress_threshold: See :py:class:`CompressingAdapter`.
+    """
+    key = (url, pool_size, compress_threshold)
+    with _sessions_lock:
+        session = _sessions.get(key)
+        if session is None:
+            session = requests.Session()
+            adapter = CompressingAdapter(
+                compress_threshold=compress_threshold,
+                pool_connections=1,
+                pool_maxsize=pool_size,
+            )
+            for prefix in "http://", "https://":
+                session.mount(prefix, adapter)
+            _sessions[key] = session
+        return session
+
+
+class PooledHTTPTransport(RequestsHTTPTransport):
+    """
+    A ``RequestsHTTPTransport`` that borrows a session from :py:func:`get_session` instead of
+    opening (and closing) a new one around every request.
+
+    :param url: The GraphQL endpoint.
+    :param pool_size: Maximum number of connections kept open to ``url``.
+    :param compress_threshold: See :py:class:`CompressingAdapter`.
+    :param kwargs: Passed to ``RequestsHTTPTransport`` (e.g. ``timeout``).
+    """
+
+    def __init__(
+        self,
+        url: str,
+        pool_size: int = 10,
+        compress_threshold: Optional[int] = None,
+        **kwargs,
+    ):
+        super().__init__(url=url, **kwargs)
+        self.pool_size = pool_size
+        self.compress_threshold = compress_threshold
+
+    def connect(self):
+        if self.session is not None:
+            raise TransportAlreadyConnected("Transport is already connected")
+        self.session = get_session(
+            self.url,
+            pool_size=self.pool_size,
+            compress_threshold=self.compress_threshold,
+        )
+
+    def close(self):
+        # the session is shared, so only release it
+        self.session = None
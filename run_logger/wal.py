@@ -0,0 +1,216 @@
+import json
+import logging
+import os
+import threading
+import uuid
+from collections import defaultdict
+from pathlib import Path
+from typing import Dict, Iterable, List, TextIO
+
+from graphql import DocumentNode
+
+from run_logger.documents import operation_name
+from run_logger.run import Client, RunLogger, jsonify
+
+_CREATE_RUN = ("insert_new_run", "add_run_to_sweep", "add_run_to_cached_sweep")
+
+
+class LocalClient:
+    """
+    A drop-in replacement for :py:class:`Client <run_logger.run.Client>` that appends runs,
+    metadata updates, logs and blobs to a write-ahead log (one JSONL file per run in ``directory``)
+    instead of sending them to Hasura. Use :py:func:`upload` (or ``run-logger upload``) to send them later.
+
+    Runs created by a ``LocalClient`` get negative placeholder IDs, which are replaced by real IDs on upload.
+    Queries (e.g. :py:func:`get_load_params <run_logger.main.get_load_params>`) are not supported, and neither
+    are runs enrolled in a sweep (whose parameters are assigned by the database when the run is created).
+
+    :param directory: The directory in which to write run files.
+    """
+
+    def __init__(self, directory: Path):
+        self.directory = Path(directory)
+        self.directory.mkdir(parents=True, exist_ok=True)
+        self._paths: Dict[int, Path] = {}
+        # opened on first write, and again after close
+        self._files: Dict[int, TextIO] = {}
+        self._lock = threading.Lock()
+
+    def execute(self, query: DocumentNode, variable_values: dict, spill: bool = False):
+        name = operation_name(query)
+        variable_values = jsonify(variable_values)
+        if name in _CREATE_RUN and variable_values.get("sweep_id") is not None:
+            raise RuntimeError("Runs enrolled in a sweep cannot be logged offline")
+        with self._lock:
+            if name in _CREATE_RUN:
+                run_id = -len(self._paths) - 1
+                self._paths[run_id] = self.directory / f"run-{uuid.uuid4().hex}.jsonl"
+                self._write(run_id, dict(op="create_run", variables=variable_values))
+                return dict(
+                    insert_run_one=dict(id=run_id, sweep=None), update_sweep=None
+                )
+            if name == "update_metadata":
+                self._write(
+                    variable_values["run_id"], dict(op=name, variables=variable_values)
+                )
+                return dict(update_run=dict(affected_rows=1))
+            if name in ("insert_run_logs", "insert_run_blobs"):
+                objects = defaultdict(list)
+                for obj in variable_values["objects"]:
+                    objects[obj["run_id"]].append(obj)
+                for run_id, objs in objects.items():
+                    self._write(run_id, dict(op=name, variables=dict(objects=objs)))
+                table = (
+                    "insert_run_log" if name == "insert_run_logs" else "insert_run_blob"
+                )
+                return {table: dict(affected_rows=len(variable_values["objects"]))}
+        raise RuntimeError(f"Operation {name!r} is not supported by LocalClient")
+
+    def replay(self) -> int:
+        return 0
+
+    def close(self):
+        """
+        Close the run files. Writing to a run again reopens its file.
+        """
+        with self._lock:
+            for f in self._files.values():
+                f.close()
+            self._files.clear()
+
+    def _write(self, run_id: int, entry: dict):
+        f = self._files.get(run_id)
+        if f is None:
+            f = self._files[run_id] = self._paths[run_id].open("a")
+        f.write(json.dumps(entry) + "\n")
+        f.flush()
+
+
+def upload(path: Path, client: Client, batch_size: int = 1000) -> int:
+    """
+    Replay a run file written by :py:class:`LocalClient` into Hasura. The run is created first;
+    then logs and blobs are streamed from the file and inserted in batches of up to ``batch_size`` rows,
+    and all metadata updates are merged into a single ``_append`` (which is equivalent, since ``_append``
+    merges top-level keys).
+
+    Progress is recorded in a sidecar file (``path`` with an ``.uploading`` suffix) after every batch,
+    so that if the upload fails, calling this function again resumes it (with the same run)
+    instead of creating a second run with duplicate rows.
+
+    :param path: A run file written by :py:class:`LocalClient`.
+    :param client: The client used to send mutations.
+    :param batch_size: Maximum number of rows per mutation.
+    :return: The ID of the uploaded run.
+    """
+    sidecar = path.with_suffix(".uploading")
+    progress = None
+    if sidecar.exists():
+        progress = json.loads(sidecar.read_text())
+        if progress["done"]:
+            return progress["run_id"]
+
+    def save(**kwargs):
+        progress.update(kwargs)
+        tmp = sidecar.with_suffix(".tmp")
+        tmp.write_text(json.dumps(progress))
+        os.replace(tmp, sidecar)
+
+    with path.open("rb") as f:
+        line = f.readline()
+        offset = len(line)
+        create = json.loads(line)
+        assert create["op"] == "create_run", f"{path} does not start with create_run"
+        if progress is None:
+            variables = create["variables"]
+            if variables.get("sweep_id") is not None:
+                raise ValueError(f"{path} is a sweep run, which cannot be uploaded")
+            run_id = client.execute(
+                RunLogger.insert_new_run_mutation, variable_values=variables
+            )["insert_run_one"]["id"]
+            progress = {}
+            save(run_id=run_id, offset=offset, sent=0, done=False)
+        else:
+            run_id = progress["run_id"]
+            logging.info(f"Resuming upload of {path} as run {run_id}")
+
+        metadata = {}
+
+        def update_metadata(entry: dict):
+            metadata.update(entry["variables"]["metadata"])
+            if metadata.get("run_id") == entry["variables"]["run_id"]:
+                # update_params stores the (placeholder) run ID in metadata
+                metadata.update(run_id=run_id)
+
+        # the position of the next row to send: the offset of its line and its index in the line
+        resume_offset, resume_sent = progress["offset"], progress["sent"]
+        op = None
+        batch: List[dict] = []
+        position = (resume_offset, resume_sent)
+
+        def send():
+            mutation = {
+                "insert_run_logs": RunLogger.insert_run_logs_mutation,
+                "insert_run_blobs": RunLogger.insert_run_blobs_mutation,
+            }[op]
+            client.execute(mutation, variable_values=dict(objects=batch))
+            save(offset=position[0], sent=position[1])
+            batch.clear()
+
+        for line in f:
+            line_offset, offset = offset, offset + len(line)
+            if not line.strip():
+                continue
+            entry = json.loads(line)
+            if entry["op"] == "update_metadata":
+                # merged again when resuming, since metadata is only sent at the end
+                update_metadata(entry)
+                continue
+            if line_offset < resume_offset:
+                # rows before the resume point were already sent
+                continue
+            if entry["op"] != op and batch:
+                send()
+            op = entry["op"]
+            objects = entry["variables"]["objects"]
+            first = resume_sent if line_offset == resume_offset else 0
+            for i in range(first, len(objects)):
+                batch.append({**objects[i], "run_id": run_id})
+                position = (line_offset, i + 1)
+                if len(batch) >= batch_size:
+                    send()
+        if batch:
+            send()
+    if metadata:
+        client.execute(
+            RunLogger.update_metadata_mutation,
+            variable_values=dict(metadata=metadata, run_id=run_id),
+        )
+    save(done=True)
+    return run_id
+
+
+def upload_all(
+    paths: Iterable[Path], graphql_endpoint: str, batch_size: int = 1000
+) -> List[int]:
+    """
+    Upload run files (or directories of run files) written by :py:class:`LocalClient`.
+    Each file is renamed with an ``.uploaded`` suffix once its upload succeeds, so that it is not uploaded twice;
+    files whose upload failed are resumed (see :py:func:`upload`).
+
+    :param paths: Run files or directories containing run files.
+    :param graphql_endpoint: The endpoint of the Hasura GraphQL API.
+    :param batch_size: Maximum number of rows per mutation.
+    :return: The IDs of the uploaded runs.
+    """
+    client = Client(graphql_endpoint=graphql_endpoint, spill_dir=None)
+    run_ids = []
+    for path in paths:
+        path = Path(path)
+        files = sorted(path.glob("run-*.jsonl")) if path.is_dir() else [path]
+        for file in files:
+            run_id = upload(file, client=client, batch_size=batch_size)
+            file.rename(file.with_name(file.name + ".uploaded"))
+            file.with_suffix(".uploading").unlink()
+            logging.info(f"Uploaded {file} as run {run_id}")
+            run_ids.append(run_id)
+    return run_ids
@@ -0,0 +1,56 @@
+import time
+
+import pytest
+
+from run_logger.background import BackgroundFlusher
+from run_logger.batching import FlushPolicy
+
+
+def test_unserializable_row_is_dropped():
+    sent = []
+    flusher = BackgroundFlusher(
+        send=lambda kind, rows: sent.extend(rows),
+        policies=dict(
+            log=FlushPolicy(),
+            blob=FlushPolicy(max_bytes=1 << 20, max_latency=10),
+        ),
+        max_queue_size=10,
+    )
+    flusher.put("log", dict(step=0))
+    flusher.put("blob", dict(metadata=object()))
+    flusher.put("blob", dict(metadata=dict(step=1)))
+    flusher.put("log", dict(step=2))
+    flusher.flush()
+    assert flusher.thread.is_alive()
+    assert sent == [dict(step=0), dict(step=2), dict(metadata=dict(step=1))]
+    flusher.close()
+
+
+# the worker thread's exception is also reported by threading.excepthook
+@pytest.mark.filterwarnings("ignore::pytest.PytestUnhandledThreadExceptionWarning")
+def test_worker_failure_is_raised():
+    flusher = BackgroundFlusher(
+        send=lambda kind, rows: None,
+        policies=dict(log=FlushPolicy()),
+        max_queue_size=1,
+    )
+    flusher.put("unknown", {})  # kills the worker thread
+    flusher.thread.join(timeout=5)
+    with pytest.raises(KeyError):
+        flusher.put("log", {})
+    with pytest.raises(KeyError):
+        flusher.flush()
+
+
+@pytest.mark.filterwarnings("ignore::pytest.PytestUnhandledThreadExceptionWarning")
+def test_flush_does_not_hang_if_worker_dies():
+    def send(kind, rows):
+        time.sleep(0.2)
+
+    flusher = BackgroundFlusher(
+        send=send, policies=dict(log=FlushPolicy()), max_queue_size=10
+    )
+    flusher.put("log", {})
+    flusher.put("unknown", {})
+    with pytest.raises(KeyError):
+        flusher.flush()
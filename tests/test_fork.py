@@ -0,0 +1,83 @@
+import gc
+import os
+
+import pytest
+
+from run_logger import fork
+from run_logger.run import RunLogger
+
+pytestmark = pytest.mark.skipif(
+    not hasattr(os, "register_at_fork"), reason="requires fork"
+)
+
+
+class RecordingClient:
+    def __init__(self):
+        self.rows = []
+
+    def execute(self, query, variable_values, spill=False):
+        self.rows.extend(variable_values.get("objects", ()))
+
+    def replay(self):
+        return 0
+
+    def close(self):
+        pass
+
+
+def in_child(fn) -> int:
+    # runs fn in a forked child and returns its exit code
+    pid = os.fork()
+    if pid == 0:
+        try:
+            code = fn()
+        except BaseException:
+            code = 2
+        os._exit(code)
+    _, status = os.waitpid(pid, 0)
+    return os.WEXITSTATUS(status)
+
+
+def test_on_child_holds_methods_weakly():
+    class Hook:
+        def after_fork(self):
+            pass
+
+    hook = Hook()
+    fork.on_child(hook.after_fork)
+    hooks = len(fork._hooks)
+    del hook
+    gc.collect()
+    assert len(fork._hooks) == hooks - 1
+
+
+def test_on_child_calls_hooks_in_child():
+    calls = []
+    fork.on_child(lambda: calls.append(os.getpid()))
+    assert in_child(lambda: 0 if calls == [os.getpid()] else 1) == 0
+    assert calls == []
+
+
+def test_flush_thread_starts_on_first_log():
+    logger = RunLogger(
+        graphql_endpoint=None,
+        _run_id=1,
+        client=RecordingClient(),
+        background=True,
+        flush_on_exit=False,
+    )
+    assert logger._flusher is None
+    logger.log(step=0)
+    logger.flush()
+    assert logger._flusher.thread.is_alive()
+
+    def child():
+        if logger._flusher is not None:
+            return 1
+        logger.log(step=1)
+        logger.flush()
+        return 0 if logger.client.rows[-1]["log"] == dict(step=1) else 1
+
+    assert in_child(child) == 0
+    logger.close()
+    assert [row["log"] for row in logger.client.rows] == [dict(step=0)]
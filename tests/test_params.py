@@ -0,0 +1,107 @@
+import json
+import math
+from collections import Counter
+from typing import Any, Mapping
+
+import numpy as np
+import pytest
+
+from run_logger.params import ParamGrid, ParamSampler, param_generator
+from run_logger.sweep import compute_remaining_runs
+
+
+# frozen copies of param_generator and compute_remaining_runs as they were before ParamGrid
+def baseline_param_generator(params: Any):
+    if isinstance(params, Mapping):
+        if tuple(params.keys()) == ("",):
+            yield from baseline_param_generator(params[""])
+            return
+        if not params:
+            yield {}
+        else:
+            (key, value), *params = params.items()
+            for choice in baseline_param_generator(value):
+                for other_choices in baseline_param_generator(dict(params)):
+                    yield {key: choice, **other_choices}
+    elif isinstance(params, (list, tuple)):
+        for choices in params:
+            yield from baseline_param_generator(choices)
+    else:
+        yield params
+
+
+def baseline_compute_remaining_runs(params):
+    if isinstance(params, list):
+        return sum(baseline_compute_remaining_runs(param) for param in params)
+    if isinstance(params, dict):
+        return math.prod(map(baseline_compute_remaining_runs, params.values()))
+    return 1
+
+
+CONFIGS = [
+    {},
+    [],
+    3,
+    {"lr": [1e-3, 1e-4], "seed": [0, 1, 2]},
+    {"lr": 1e-3, "model": {"depth": [2, 4], "width": [8, 16]}},
+    # choice among mappings of different sizes
+    {"lr": [1e-3, 1e-4], "model": [{"depth": [2, 4]}, {"width": 8}, []]},
+    [{"a": [1, 2]}, {"b": [3, 4, 5]}, 6],
+    # a lone "" key
+    {"": [{"a": 1}, {"a": 2, "b": [3, 4]}]},
+    {"x": {"": [1, 2]}},
+    # a last "" key beside other keys is merged into the mapping
+    {"lr": [1, 2], "": [{"a": [3, 4]}, {"b": 5}]},
+    {"lr": [1, 2], "": {"": [{"a": 3}, {"b": [4, 5]}]}},
+    {"outer": {"lr": [1, 2], "": [{"a": 3}, {"a": 4, "c": [5, 6]}]}},
+    # a "" key that is not last is kept as a key
+    {"": [{"a": 1}, {"a": 2}], "lr": [1, 2]},
+    # nested lists are flattened
+    {"lr": [[1, 2], [3, [4, 5]]], "seed": [0, 1]},
+    {"a": [{"b": [{"c": [1, 2]}, {"d": 3}]}, {"e": [4, 5]}], "f": [6, 7]},
+]
+
+
+@pytest.mark.parametrize("config", CONFIGS)
+def test_grid_matches_baseline(config):
+    expected = list(baseline_param_generator(config))
+    grid = ParamGrid(config)
+    assert list(grid) == expected
+    assert list(param_generator(config)) == expected
+    assert [grid[i] for i in range(len(grid))] == expected
+    assert grid.size == len(expected) == baseline_compute_remaining_runs(config)
+    assert compute_remaining_runs(config) == baseline_compute_remaining_runs(config)
+
+
+def test_grid_indexing():
+    grid = ParamGrid(CONFIGS[5])
+    assert grid[-1] == list(grid)[-1]
+    with pytest.raises(IndexError):
+        grid[grid.size]
+
+
+def test_sampler_is_uniform_over_grid():
+    # every list is uniform over alternatives of equal size, so every combination is equally likely
+    config = {
+        "lr": [1e-3, 1e-4, 1e-5],
+        "model": [{"depth": [2, 4]}, {"width": [8, 16]}],
+        "activation": ["relu", "tanh"],
+    }
+    grid = ParamGrid(config)
+    indices = {json.dumps(params, sort_keys=True): i for i, params in enumerate(grid)}
+    n = 60000
+    samples = ParamSampler(config, rng=0).sample(n)
+    counts = Counter(indices[json.dumps(params, sort_keys=True)] for params in samples)
+    assert set(counts) == set(range(grid.size))
+    expected = n / grid.size
+    assert all(abs(count - expected) < 0.1 * expected for count in counts.values())
+
+
+def test_sampler_columns():
+    config = {"lr": [1e-3, 1e-4], "depth": [2, 4], "mixed": [True, 2, "a"]}
+    columns = ParamSampler(config, rng=0).columns(1000)
+    assert columns["lr"].dtype == np.float64
+    assert columns["depth"].dtype.kind == "i"
+    assert columns["mixed"].dtype == object
+    assert set(columns["mixed"].tolist()) == {True, 2, "a"}
+    assert set(type(v) for v in columns["mixed"]) == {bool, int, str}
@@ -0,0 +1,63 @@
+import requests
+from gql import gql
+from gql.transport.exceptions import TransportQueryError
+
+from run_logger.retry import SpillQueue
+
+MUTATION = gql("mutation m($i: Int!) { m(i: $i) { affected_rows } }")
+
+
+def test_replay_resumes_after_retryable_failure(tmp_path):
+    queue = SpillQueue(tmp_path / "1-a.jsonl")
+    for i in range(4):
+        queue.append(MUTATION, dict(i=i))
+    sent = []
+
+    def execute(query, variable_values):
+        if variable_values["i"] == 2:
+            raise requests.ConnectionError()
+        sent.append(variable_values["i"])
+
+    assert queue.replay(execute) == 2
+    assert sent == [0, 1]
+    assert len(queue) == 2
+    assert len(SpillQueue(queue.path)) == 2
+
+    sent.clear()
+    assert (
+        queue.replay(lambda query, variable_values: sent.append(variable_values["i"]))
+        == 2
+    )
+    assert sent == [2, 3]
+    assert len(queue) == 0
+    assert not queue.path.exists()
+
+
+def test_replay_moves_rejected_mutations_to_dead_letters(tmp_path):
+    queue = SpillQueue(tmp_path / "1-a.jsonl")
+    for i in range(3):
+        queue.append(MUTATION, dict(i=i))
+
+    def execute(query, variable_values):
+        if variable_values["i"] == 1:
+            raise TransportQueryError("constraint violation")
+
+    assert queue.replay(execute) == 2
+    assert len(queue) == 0
+    assert len(queue.dead_letter_path.read_text().splitlines()) == 1
+
+
+def test_append_during_replay(tmp_path):
+    queue = SpillQueue(tmp_path / "1-a.jsonl")
+    queue.append(MUTATION, dict(i=0))
+    sent = []
+
+    def execute(query, variable_values):
+        # would deadlock if the queue's lock were held while sending
+        if variable_values["i"] < 3:
+            queue.append(MUTATION, dict(i=variable_values["i"] + 1))
+        sent.append(variable_values["i"])
+
+    assert queue.replay(execute) == 4
+    assert sent == [0, 1, 2, 3]
+    assert len(queue) == 0
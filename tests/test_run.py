@@ -0,0 +1,63 @@
+import numpy as np
+import pytest
+
+from run_logger.run import RunLogger
+
+
+class RecordingClient:
+    def __init__(self):
+        self.logs = []
+
+    def execute(self, query, variable_values, spill=False):
+        self.logs.extend(row["log"] for row in variable_values.get("objects", ()))
+
+    def replay(self):
+        return 0
+
+    def close(self):
+        pass
+
+
+@pytest.fixture
+def logger():
+    logger = RunLogger(
+        graphql_endpoint=None,
+        _run_id=1,
+        client=RecordingClient(),
+        flush_on_exit=False,
+    )
+    yield logger
+    logger.close()
+
+
+@pytest.mark.parametrize(
+    "column",
+    [
+        [True, 2],
+        [1, "a"],
+        [1, 2.5],
+        [None, 1],
+        [{"a": 1}, [1, 2]],
+    ],
+)
+def test_log_arrays_keeps_mixed_types(logger, column):
+    logger.log_arrays(x=column)
+    assert logger.client.logs == [dict(x=value) for value in column]
+    assert [type(log["x"]) for log in logger.client.logs] == [
+        type(value) for value in column
+    ]
+
+
+def test_log_arrays_converts_arrays(logger):
+    logger.log_arrays(
+        step=np.arange(3),
+        loss=np.array([0.5, np.nan, 0.25], dtype=np.float32),
+        done=[False, False, True],
+        name=np.array(["a", "b", "c"]),
+    )
+    assert logger.client.logs == [
+        dict(step=0, loss=0.5, done=False, name="a"),
+        dict(step=1, loss=None, done=False, name="b"),
+        dict(step=2, loss=0.25, done=True, name="c"),
+    ]
+    assert type(logger.client.logs[0]["step"]) is int
@@ -0,0 +1,96 @@
+import signal
+import subprocess
+import sys
+import textwrap
+import time
+
+import pytest
+
+from run_logger import shutdown
+
+# A run whose main thread is interrupted while it holds the client's lock (in a slow update_metadata),
+# with logs still held back by debouncing.
+SCRIPT = textwrap.dedent(
+    """
+    import atexit, json, sys, threading, time
+    from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+    rows = []
+
+    class Handler(BaseHTTPRequestHandler):
+        def log_message(self, *args):
+            pass
+
+        def do_POST(self):
+            request = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+            query, variables = request["query"], request.get("variables") or {}
+            data = {}
+            if "insert_run_one" in query:
+                data["insert_run_one"] = {"id": 1}
+            if "insert_run_log" in query:
+                rows.extend(variables["objects"])
+                data["insert_run_log"] = {"affected_rows": len(variables["objects"])}
+            if "update_run" in query:
+                time.sleep(5)
+                data["update_run"] = {"affected_rows": 1}
+            body = json.dumps({"data": data}).encode()
+            self.send_response(200)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    # registered first, so it runs after the loggers are closed
+    atexit.register(lambda: print("rows", len(rows), flush=True))
+
+    from run_logger import RunLogger
+
+    logger = RunLogger(
+        f"http://127.0.0.1:{server.server_address[1]}/v1/graphql", debounce_time=10
+    )
+    logger.create_run(metadata={}, charts=[])
+    logger.log(step=0)
+    logger.log(step=1)
+    print("ready", flush=True)
+    logger.update_metadata({"progress": 1})
+    """
+)
+
+
+@pytest.mark.parametrize("signum", [signal.SIGINT, signal.SIGTERM])
+def test_signal_during_request_does_not_hang(signum):
+    process = subprocess.Popen(
+        [sys.executable, "-c", SCRIPT],
+        stdout=subprocess.PIPE,
+        stderr=subprocess.PIPE,
+        text=True,
+    )
+    try:
+        assert process.stdout.readline().strip() == "ready"
+        time.sleep(0.5)  # let update_metadata reach the server
+        process.send_signal(signum)
+        stdout, _ = process.communicate(timeout=20)
+    finally:
+        process.kill()
+    assert process.returncode != 0
+    assert "rows 2" in stdout
+
+
+@pytest.mark.parametrize(
+    "signum, exception",
+    [(signal.SIGINT, KeyboardInterrupt), (signal.SIGTERM, SystemExit)],
+)
+@pytest.mark.parametrize("previous", [None, signal.SIG_DFL])
+def test_signal_with_default_or_c_handler_is_not_swallowed(
+    monkeypatch, signum, exception, previous
+):
+    monkeypatch.setitem(shutdown._previous_handlers, signum, previous)
+    with pytest.raises(exception):
+        shutdown._handle_signal(signum, None)
+
+
+def test_ignored_signal_stays_ignored(monkeypatch):
+    monkeypatch.setitem(shutdown._previous_handlers, signal.SIGTERM, signal.SIG_IGN)
+    shutdown._handle_signal(signal.SIGTERM, None)
@@ -0,0 +1,45 @@
+import pytest
+import requests
+
+from run_logger.retry import RetryPolicy
+from run_logger.run import Client, RunLogger
+from run_logger.stats import Stats
+
+
+def failing_hook(event):
+    raise ValueError("hook failed")
+
+
+@pytest.fixture
+def client():
+    events = []
+    client = Client(
+        graphql_endpoint="http://127.0.0.1:1/v1/graphql",
+        retry_policy=RetryPolicy(max_attempts=1),
+        spill_dir=None,
+        stats=Stats(hooks=[failing_hook, events.append]),
+    )
+    client.events = events
+    return client
+
+
+def test_failing_hook_does_not_fail_call(client, monkeypatch):
+    monkeypatch.setattr(
+        client.client, "execute", lambda query, variable_values: dict(ok=True)
+    )
+    result = client.execute(RunLogger.insert_run_logs_mutation, dict(objects=[{}]))
+    assert result == dict(ok=True)
+    [event] = client.events
+    assert event.error is None and event.rows == 1
+    assert client.stats.operations["insert_run_logs"].calls == 1
+
+
+def test_failing_hook_does_not_mask_error(client, monkeypatch):
+    def execute(query, variable_values):
+        raise requests.ConnectionError("refused")
+
+    monkeypatch.setattr(client.client, "execute", execute)
+    with pytest.raises(requests.ConnectionError):
+        client.execute(RunLogger.insert_run_logs_mutation, dict(objects=[{}]))
+    [event] = client.events
+    assert isinstance(event.error, requests.ConnectionError)
@@ -0,0 +1,78 @@
+import json
+
+import pytest
+
+from run_logger.run import RunLogger
+from run_logger.wal import LocalClient, upload
+
+
+class FlakyClient:
+    # fails the first insert after `fail_after` rows have been inserted
+    def __init__(self, fail_after=None):
+        self.fail_after = fail_after
+        self.runs = 0
+        self.rows = []
+        self.metadata = {}
+
+    def execute(self, query, variable_values, spill=False):
+        name = query.definitions[0].name.value
+        if name == "insert_new_run":
+            self.runs += 1
+            return dict(insert_run_one=dict(id=7))
+        if name == "update_metadata":
+            self.metadata.update(variable_values["metadata"])
+            return dict(update_run=dict(affected_rows=1))
+        if self.fail_after is not None and len(self.rows) >= self.fail_after:
+            self.fail_after = None
+            raise ConnectionError("connection reset")
+        self.rows.extend(variable_values["objects"])
+        return {}
+
+
+@pytest.fixture
+def run_file(tmp_path):
+    client = LocalClient(tmp_path)
+    with RunLogger(graphql_endpoint=None, client=client, flush_on_exit=False) as logger:
+        logger.create_run(metadata=dict(name="run"))
+        logger.update_metadata(dict(progress=0))
+        for step in range(10):
+            # a row that mentions update_metadata is still a row
+            logger.log(step=step, note="update_metadata")
+        logger.update_metadata(dict(progress=1))
+        logger.blob("blob", metadata=dict(step=10))
+        logger.log_many([dict(step=step) for step in range(11, 14)])
+    assert not client._files  # closed by RunLogger.close
+    [path] = tmp_path.glob("run-*.jsonl")
+    return path
+
+
+def test_upload(run_file):
+    client = FlakyClient()
+    assert upload(run_file, client, batch_size=4) == 7
+    assert client.runs == 1
+    assert [row.get("log", {}).get("step", 10) for row in client.rows] == list(
+        range(14)
+    )
+    assert all(row["run_id"] == 7 for row in client.rows)
+    assert client.metadata == dict(progress=1)
+
+
+@pytest.mark.parametrize("fail_after", [0, 3, 4, 8, 10, 11])
+def test_upload_resumes(run_file, fail_after):
+    client = FlakyClient(fail_after=fail_after)
+    with pytest.raises(ConnectionError):
+        upload(run_file, client, batch_size=4)
+    assert client.metadata == {}
+    progress = json.loads(run_file.with_suffix(".uploading").read_text())
+    assert not progress["done"]
+
+    assert upload(run_file, client, batch_size=4) == 7
+    assert client.runs == 1
+    steps = [row.get("log", {}).get("step", 10) for row in client.rows]
+    assert steps == list(range(14))
+    assert client.metadata == dict(progress=1)
+    assert json.loads(run_file.with_suffix(".uploading").read_text())["done"]
+
+    # a finished upload is not repeated
+    assert upload(run_file, client, batch_size=4) == 7
+    assert len(client.rows) == 14